@@ -2,7 +2,7 @@ import os
 from dataclasses import dataclass
 from configs.configs import ProcessorConfig
 from sql.database import Database, Config
-from connector import BoxConnector, BlobStorageConnector,S3_Connector
+from connector import BoxConnector, BlobStorageConnector,S3_Connector, LocalConnector
 from services.service_manager import ServiceManager
 from logs.logger import DualLogger
 
@@ -31,6 +31,8 @@ class Audio_Processer:
             return BlobStorageConnector()
         elif connector == 'BOX':
             return BoxConnector()
+        elif connector == 'LOCAL':
+            return LocalConnector()
         else:
             raise Exception("Processor not Implemented")
 
@@ -0,0 +1,51 @@
+"""
+Cut planning (segments of every audio) with Audio_Cutter._get_segments_audios,
+grouped by Audio_id, against the previous scan of all segments per audio.
+Planning time should grow linearly with the number of segments.
+    python -m benchmarks.bench_cut_planning [segments ...]
+"""
+import sys
+import logging
+from typing import List, Dict
+from models.models import Audio_Segments
+from services.audio_cutter_service import Audio_Cutter
+from benchmarks.utils import benchmark_database, timer
+
+SEGMENTS_PER_AUDIO : int = 10
+# the previous scan is quadratic, it is only run up to this many segments
+MAX_SCAN_SEGMENTS : int = 20_000
+
+
+def plan_by_scan(audio_files: List[Dict], audio_segments: List[Dict]) -> List[List[Dict]]:
+    """
+    Cut planning before the grouping, every audio scans every segment
+    """
+    return [[f for f in audio_segments if f.get("Audio_id") == audio.get("id")] for audio in audio_files]
+
+
+def run(segments: int) -> None:
+
+    database = benchmark_database()
+    audios : int = segments // SEGMENTS_PER_AUDIO
+    database.add_data_to_db(Audio_Segments, [{"Audio_id": i % audios + 1,
+                                              "Segment_number": str(i // audios),
+                                              "Start_time": float(i // audios),
+                                              "End_time": float(i // audios) + 0.5,
+                                              "Status": "Ready_To_Cutted"} for i in range(segments)])
+    audio_files : List[Dict] = [{"id": i + 1} for i in range(audios)]
+    cutter = Audio_Cutter(database, None, logging.getLogger("benchmark"))
+
+    with timer(f"{segments} segments, grouped planning (query + group)"):
+        grouped = cutter._get_segments_audios()
+        plan = [grouped.get(audio.get("id"), []) for audio in audio_files]
+
+    if segments <= MAX_SCAN_SEGMENTS:
+        flat : List[Dict] = [segm for segms in grouped.values() for segm in segms]
+        with timer(f"{segments} segments, scan planning (grouping only)"):
+            scanned = plan_by_scan(audio_files, flat)
+        assert [len(s) for s in scanned] == [len(s) for s in plan]
+
+
+if __name__ == "__main__":
+    for segments in [int(arg) for arg in sys.argv[1:]] or [10_000, 20_000, 50_000, 100_000, 200_000]:
+        run(segments)
@@ -0,0 +1,86 @@
+"""
+Per segment overhead of the memory cut mode at 1k segments per file: the
+single decode + numpy views extraction (cut_audio_in_memory) against the
+previous per segment slicing and downmix. Extraction is timed on the decoded
+array, decode and WAV encode (to buffers, no disk) are reported apart.
+    python -m benchmarks.bench_segment_extraction [segments]
+"""
+import os
+import sys
+import time
+import tempfile
+from typing import List, Dict
+import numpy as np
+import librosa
+import soundfile as sf
+from services.cutting_engine import cut_audio_in_memory, normalize_timestamp, segment_frames, write_segment
+
+SAMPLING_RATE : int = 44100
+SEGMENT_SECONDS : float = 1.0
+
+
+def slots_by_slicing(time_series: np.ndarray, sampling_rate: int, segments: List[Dict]) -> List[np.ndarray]:
+    """
+    Segment extraction before the vectorized engine: per segment timestamps,
+    a 2D slice attempt inside try/except and a downmix of the already mono slot
+    """
+    slots : List[np.ndarray] = []
+    for segm in segments:
+        start_time = normalize_timestamp(segm.get("Start_time"), sampling_rate)
+        end_time = normalize_timestamp(segm.get("End_time"), sampling_rate)
+        try:
+            slot = time_series[:, start_time:end_time]
+        except:
+            slot = time_series[start_time:end_time]
+        slots.append(librosa.to_mono(slot))
+    return slots
+
+
+def slots_by_views(time_series: np.ndarray, sampling_rate: int, segments: List[Dict]) -> List[np.ndarray]:
+    """
+    Vectorized extraction of cut_audio_in_memory: all bounds at once, zero copy views
+    """
+    frames : np.ndarray = segment_frames(segments, sampling_rate, len(time_series))
+    return [time_series[start:end] for start, end in frames]
+
+
+def best_of(func, repeat: int = 3) -> float:
+    timings : List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(segments: int) -> None:
+
+    duration : float = segments * SEGMENT_SECONDS * 1.2
+    with tempfile.TemporaryDirectory() as folder:
+        path : str = os.path.join(folder, "source.wav")
+        rng = np.random.default_rng(0)
+        sf.write(path, (rng.standard_normal((int(duration * SAMPLING_RATE), 2)) * 0.1).astype("float32"), SAMPLING_RATE)
+
+        audio : Dict = {"id": 1, "Audio_name": "source.wav", "Local_path": path}
+        segms : List[Dict] = [{"Audio_id": 1, "id": i, "Segment_number": str(i),
+                               "Start_time": i * SEGMENT_SECONDS * 1.2,
+                               "End_time": i * SEGMENT_SECONDS * 1.2 + SEGMENT_SECONDS} for i in range(segments)]
+
+        time_series, sampling_rate = librosa.load(path, sr=None, mono=True)
+        decode : float = best_of(lambda: librosa.load(path, sr=None, mono=True))
+        previous : float = best_of(lambda: slots_by_slicing(time_series, sampling_rate, segms))
+        views : float = best_of(lambda: slots_by_views(time_series, sampling_rate, segms))
+        encode : float = best_of(lambda: [write_segment(segm, slot, sampling_rate, True)
+                                          for segm, slot in zip(segms, slots_by_views(time_series, sampling_rate, segms))])
+        total : float = best_of(lambda: cut_audio_in_memory(audio, segms, to_buffer=True))
+
+    print(f"{segments} segments of {SEGMENT_SECONDS} s, {duration:.0f} s stereo source at {SAMPLING_RATE} Hz")
+    print(f"{'decode + downmix (once)':<32} {decode:8.3f} s")
+    print(f"{'extraction, previous slicing':<32} {previous:8.4f} s  {previous / segments * 1e6:8.1f} us/segment")
+    print(f"{'extraction, vectorized views':<32} {views:8.4f} s  {views / segments * 1e6:8.1f} us/segment")
+    print(f"{'WAV encode to buffers':<32} {encode:8.3f} s  {encode / segments * 1e3:8.3f} ms/segment")
+    print(f"{'cut_audio_in_memory end to end':<32} {total:8.3f} s")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,50 @@
+"""
+Database.update_status (grouped UPDATE ... WHERE id IN) against the previous
+per id SELECT + ORM update, at 10k and 100k rows.
+    python -m benchmarks.bench_update_status [rows ...]
+BENCH_DB_URL runs it on another backend (e.g. postgres), in-memory sqlite otherwise
+"""
+import sys
+from typing import List
+from sqlalchemy import select, func
+from models.models import AudioCollection
+from benchmarks.utils import benchmark_database, timer
+
+
+def update_status_per_row(database, model, id_list: List[int], status_list: List[str]) -> None:
+    """
+    update_status before the bulk version, one query per id
+    """
+    with database.session_scope() as session:
+        for value, sta in zip(id_list, status_list):
+            entry_to_modify = session.query(model).filter_by(id=value).first()
+            if entry_to_modify:
+                entry_to_modify.Status = sta
+        session.commit()
+
+
+def run(rows: int) -> None:
+
+    database = benchmark_database()
+    database.add_data_to_db(AudioCollection, [{"id": i + 1,
+                                               "Filepath": f"data/2024-01-01/{i}.wav",
+                                               "Audio_name": f"{i}.wav",
+                                               "Status": "Ingested"} for i in range(rows)])
+    ids : List[int] = list(range(1, rows + 1))
+    # two target statuses, as the services mix segmented and failed audios
+    statuses : List[str] = ["Segmented" if i % 2 else "Failed" for i in ids]
+
+    with timer(f"{rows} rows, per row update"):
+        update_status_per_row(database, AudioCollection, ids, statuses)
+
+    with timer(f"{rows} rows, bulk update_status"):
+        database.update_status(AudioCollection, ids, ["Audio_Cutted"] * rows)
+
+    with database.session_scope() as session:
+        updated = session.execute(select(func.count()).where(AudioCollection.Status == "Audio_Cutted")).scalar()
+    assert updated == rows
+
+
+if __name__ == "__main__":
+    for rows in [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]:
+        run(rows)
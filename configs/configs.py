@@ -38,7 +38,7 @@ class FileConfig(Config):
 class ProcessorConfig(FileConfig):
 
     REQUIRED_COLUMNS = ["PROCESSOR", "DATASOURCE", "ENGINE"]
-    PROCESSOR_AVAILABLE = ["S3","BLOB", "BOX"]
+    PROCESSOR_AVAILABLE = ["S3","BLOB", "BOX", "LOCAL"]
     ENGINE_AVAILABLE = ["postgres","mssql","sqlserver","sqlite"]
 
     @property
@@ -1,3 +1,5 @@
 from connector.box_connection import BoxConnector
 from connector.blob_connection import BlobStorageConnector
-from connector.s3_connection import S3_Connector
\ No newline at end of file
+from connector.s3_connection import S3_Connector
+from connector.local_connection import LocalConnector
+from connector.async_connection import get_async_connector
\ No newline at end of file
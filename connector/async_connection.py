@@ -0,0 +1,181 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List
+from environments.environments import Environments
+from connector.blob_connection import BlobStorageConnector
+from connector.s3_connection import S3_Connector
+
+try:
+    # the azure aio transport needs aiohttp, which azure-storage-blob does not install
+    import aiohttp
+    from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+except ImportError:
+    AsyncBlobServiceClient = None
+
+try:
+    from aiobotocore.session import get_session
+except ImportError:
+    get_session = None
+
+
+class AsyncThreadedConnector:
+
+    """
+    Async interface over a synchronous connector (e.g. Box), every call
+    runs in a bounded thread pool. Paths are passed as folder/name, which
+    every connector (Box included) accepts
+    """
+
+    def __init__(self, connector: object, max_workers: int = 32) -> None:
+        self._con = connector
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    async def download_file(self, blob_name: str, filepath: str):
+        return await self._run(self._con.download_file, blob_name, filepath)
+
+    async def upload_file(self, filepath: str, blob_name: str):
+        return await self._run(self._con.upload_file, filepath, blob_name)
+
+    async def upload_bytes(self, data: bytes, blob_name: str):
+        return await self._run(self._con.upload_bytes, data, blob_name)
+
+    async def get_public_link(self, blob_name: str) -> str:
+        return await self._run(self._con.get_public_link, blob_name)
+
+    async def list_files(self, folder: str = None, container: str = None) -> List[str]:
+        return await self._run(lambda: list(self._con.iter_list_files(folder=folder, container=container)))
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class AsyncBlobStorageConnector:
+
+    """
+    Async Blob Storage connector on azure.storage.blob.aio,
+    SAS links are still signed locally by the synchronous connector
+    """
+
+    def __init__(self, connector: BlobStorageConnector) -> None:
+        self._con = connector
+        self.container : str = connector.container
+        chunk_size : int = Environments.get_transfer_chunk_size()
+        self.client = AsyncBlobServiceClient(account_url=f"https://{connector.user}.blob.core.windows.net",
+                                             credential=connector.key,
+                                             max_single_get_size=chunk_size,
+                                             max_chunk_get_size=chunk_size)
+
+    def _blob(self, blob_name: str, container: str = None):
+        return self.client.get_blob_client(container=container if container else self.container, blob=blob_name)
+
+    async def download_file(self, blob_name: str, filepath: str, container: str = None):
+        stream = await self._blob(blob_name, container).download_blob(max_concurrency=Environments.get_transfer_max_concurrency())
+        with open(filepath, "wb") as f:
+            async for chunk in stream.chunks():
+                f.write(chunk)
+
+    async def upload_file(self, filepath: str, blob_name: str, container: str = None):
+        with open(filepath, "rb") as data:
+            await self._blob(blob_name, container).upload_blob(data, overwrite=True, max_concurrency=Environments.get_transfer_max_concurrency())
+
+    async def upload_bytes(self, data: bytes, blob_name: str, container: str = None):
+        await self._blob(blob_name, container).upload_blob(data, overwrite=True, max_concurrency=Environments.get_transfer_max_concurrency())
+
+    async def get_public_link(self, blob_name: str, container: str = None) -> str:
+        return self._con.get_public_link(blob_name, container)
+
+    async def list_files(self, folder: str = None, container: str = None) -> List[str]:
+        client_container = self.client.get_container_client(container=container if container else self.container)
+        return [blob.name async for blob in client_container.list_blobs(name_starts_with=folder)]
+
+    async def close(self):
+        await self.client.close()
+
+
+class AsyncS3_Connector:
+
+    """
+    Async S3 connector on aiobotocore,
+    presigned urls are still generated locally by the synchronous connector
+    """
+
+    def __init__(self, connector: S3_Connector) -> None:
+        self._con = connector
+        self.bucket : str = connector.bucket
+        self._client_context = None
+        self.client = None
+
+    async def _get_client(self):
+        if self.client is None:
+            self._client_context = get_session().create_client(
+                "s3",
+                aws_access_key_id=Environments.get_s3_access_key(),
+                aws_secret_access_key=Environments.get_s3_secret_key(),
+                endpoint_url=Environments.get_s3_url(),
+            )
+            self.client = await self._client_context.__aenter__()
+        return self.client
+
+    async def download_file(self, object_name: str, filepath: str, bucket: str = None):
+        client = await self._get_client()
+        response = await client.get_object(Bucket=bucket if bucket else self.bucket, Key=object_name)
+        chunk_size : int = Environments.get_transfer_chunk_size()
+
+        async with response["Body"] as stream:
+            with open(filepath, "wb") as f:
+                while True:
+                    chunk = await stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+
+    async def upload_file(self, filepath: str, filename: str = None, bucket_name: str = None):
+        client = await self._get_client()
+        with open(filepath, "rb") as data:
+            await client.put_object(Bucket=bucket_name if bucket_name else self.bucket,
+                                    Key=filename if filename else filepath,
+                                    Body=data)
+
+    async def upload_bytes(self, data: bytes, filename: str, bucket_name: str = None):
+        client = await self._get_client()
+        await client.put_object(Bucket=bucket_name if bucket_name else self.bucket, Key=filename, Body=data)
+
+    async def get_public_link(self, filepath: str, bucket: str = None) -> str:
+        return self._con.get_public_link(filepath, bucket)
+
+    async def list_files(self, folder: str = None, container: str = None) -> List[str]:
+        client = await self._get_client()
+        files : List[str] = []
+        async for page in client.get_paginator("list_objects_v2").paginate(Bucket=container if container else self.bucket,
+                                                                            Prefix=folder if folder else ""):
+            files.extend(key["Key"] for key in page.get("Contents", []) if key["Size"] != 0)
+        return files
+
+    async def close(self):
+        if self._client_context is not None:
+            await self._client_context.__aexit__(None, None, None)
+            self._client_context = None
+            self.client = None
+
+
+def get_async_connector(connector: object, max_workers: int = 32) -> object:
+    """
+    Async variant of a connector, native aio clients for Blob (azure aio) and
+    S3 (aiobotocore) when installed, threaded fallback for Box, Local or missing packages
+    :param connector: synchronous connector
+    :param max_workers: threads of the fallback
+    """
+    if isinstance(connector, BlobStorageConnector) and AsyncBlobServiceClient is not None:
+        try:
+            return AsyncBlobStorageConnector(connector)
+        except ImportError as e:
+            print(f"Error creating the async Blob client, using threads: {e}")
+
+    if isinstance(connector, S3_Connector) and get_session is not None:
+        return AsyncS3_Connector(connector)
+
+    return AsyncThreadedConnector(connector, max_workers=max_workers)
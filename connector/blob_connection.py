@@ -1,10 +1,16 @@
 import os
 from datetime import datetime
-from azure.storage.blob import BlobServiceClient,generate_blob_sas,BlobSasPermissions,ContentSettings
+from azure.storage.blob import BlobServiceClient,generate_blob_sas,BlobSasPermissions,ContentSettings,BlobPrefix
 from dateutil.relativedelta import relativedelta
 import pandas as pd
 from environments.environments import Environments
 import io
+import json
+from typing import List, Tuple, Dict, Iterator
+from functools import partial
+from connector.ttl_cache import TTLCache, LINK_TTL_RATIO
+from connector.listing import iter_parallel, shard_prefix, load_cursor, last_shard, is_new
+from dateutil.parser import isoparse
 
 class BlobStorageConnector:
 
@@ -14,6 +20,7 @@ class BlobStorageConnector:
 
         self.container :str =  Environments.get_blob_container()
         self.client : object = self._build_client()
+        self._links : TTLCache = TTLCache()
 
     def _build_client(self):
         """
@@ -21,8 +28,11 @@ class BlobStorageConnector:
         """
         self.user :str = Environments.get_blob_user()
         self.key :str = Environments.get_blob_key()
+        chunk_size :int = Environments.get_transfer_chunk_size()
         return BlobServiceClient(account_url=f"https://{self.user}.blob.core.windows.net",
-                                 credential=self.key)
+                                 credential=self.key,
+                                 max_single_get_size=chunk_size,
+                                 max_chunk_get_size=chunk_size)
 
     def upload_file(self,
                     file_path: str,
@@ -40,9 +50,24 @@ class BlobStorageConnector:
 
         with open(file_path, "rb") as data:
             blob.upload_blob(
-                data, overwrite=True, max_concurrency=4
+                data, overwrite=True, max_concurrency=Environments.get_transfer_max_concurrency()
             )
 
+    def upload_bytes(self,
+                     data: bytes,
+                     blob_name: str,
+                     container: str=None):
+
+        """
+        FUNCTION TO UPLOAD IN MEMORY DATA TO CONTAINER
+        :params data : bytes or file-like object to be uploaded
+        :params blob_name : path of file in blob
+        :container : container to upload file
+        """
+
+        blob : object = self.client.get_blob_client(container=container if container else self.container, blob=blob_name)
+        blob.upload_blob(data, overwrite=True, max_concurrency=Environments.get_transfer_max_concurrency())
+
     def delete_file(self,
                     blob_name:str,
                     container=None):
@@ -64,12 +89,52 @@ class BlobStorageConnector:
                       filepath:str,
                       container:str=None):
 
+        """
+        FUNCTION TO DOWNLOAD FILE FROM STORAGE
+        The blob is streamed to disk in TRANSFER_CHUNK_SIZE ranges fetched
+        by TRANSFER_MAX_CONCURRENCY connections, so memory stays constant
+        :params blob_name : path of file inside blob
+        :params filepath : local path to write the file
+        :params container : if specific container in signature
+        """
+
         blob = self.client.get_blob_client(container= container if container else self.container, blob= blob_name)
 
         with open(filepath, "wb") as f:
-            blob_data = blob.download_blob()
-            f.write(blob_data.readall())
+            blob_data = blob.download_blob(max_concurrency=Environments.get_transfer_max_concurrency())
+            blob_data.readinto(f)
+
+
+    def get_file_properties(self,
+                            blob_name:str,
+                            container:str=None)->dict:
+
+        """
+        FUNCTION TO GET SIZE AND ETAG OF A FILE
+        :params blob_name : path of file inside blob
+        :params container : if specific container in signature
+        """
+
+        blob = self.client.get_blob_client(container= container if container else self.container, blob= blob_name)
+        properties = blob.get_blob_properties()
+        return {"size": properties.size, "etag": properties.etag}
 
+    def read_range(self,
+                   blob_name:str,
+                   offset:int,
+                   length:int,
+                   container:str=None)->bytes:
+
+        """
+        FUNCTION TO READ A BYTE RANGE OF A FILE (HTTP Range request)
+        :params blob_name : path of file inside blob
+        :params offset : first byte to read
+        :params length : number of bytes to read
+        :params container : if specific container in signature
+        """
+
+        blob = self.client.get_blob_client(container= container if container else self.container, blob= blob_name)
+        return blob.download_blob(offset=offset, length=length).readall()
 
     def get_public_link(self,
                      blob_name:str,
@@ -77,21 +142,49 @@ class BlobStorageConnector:
 
         """
         FUNCTION TO GENERATE SAS LINK FROM FILE
+        Links are cached until shortly before their token expires
         :params blob_name : path of file inside blob
         :params container : if specific container in signature
         """
 
-        file :object =  self.client.get_blob_client(container=container if container else self.container , blob=blob_name)
+        container = container if container else self.container
+        return self._links.get_or_set((container, blob_name), lambda: self._generate_public_link(blob_name, container))
+
+    def get_public_links(self,
+                         blob_names:List[str],
+                         container:str=None)->Dict[str, str]:
+
+        """
+        FUNCTION TO GENERATE SAS LINKS FOR MANY FILES
+        :params blob_names : paths of files inside blob
+        :params container : if specific container in signature
+        :return: dict blob_name -> link
+        """
+
+        return {blob_name: self.get_public_link(blob_name, container) for blob_name in blob_names}
+
+    def _generate_public_link(self,
+                              blob_name:str,
+                              container:str)->Tuple[str, float]:
+
+        """
+        FUNCTION TO SIGN A NEW SAS LINK, RETURNS THE LINK AND HOW LONG IT CAN BE CACHED
+        """
+
+        file :object =  self.client.get_blob_client(container=container, blob=blob_name)
+
+        now : datetime = datetime.utcnow()
+        expiry : datetime = now + relativedelta(months=3)
 
         token :str = generate_blob_sas(account_name=self.user,
                                     account_key = self.key,
-                                    container_name = container if container else self.container,
+                                    container_name = container,
                                     blob_name= blob_name,
                                     permission=BlobSasPermissions(read=True, tag=False),
-                                    expiry=datetime.utcnow() + relativedelta(months=3)
+                                    expiry=expiry
                                     )
 
-        return file.url + "?" + token
+        return file.url + "?" + token, (expiry - now).total_seconds() * LINK_TTL_RATIO
 
     def get_list_files(self,
                         container:str = None,
@@ -103,11 +196,92 @@ class BlobStorageConnector:
         :params folder : To returns only the files present in a specific folder
         """
 
+        return list(self.iter_list_files(folder=folder, container=container))
+
+    def iter_list_files(self,
+                        folder:str = None,
+                        container:str = None,
+                        parallel:bool = False,
+                        max_workers:int = 8)->Iterator[str]:
+
+        """
+        FUNCTION TO LIST ALL FILES INSIDE A CONTAINER, YIELDING NAMES AS PAGES ARRIVE
+        :params folder : To returns only the files present in a specific folder
+        :params container : container where files are
+        :params parallel : list every sub folder of folder (e.g. date folders) concurrently
+        :params max_workers : number of sub folders listed at the same time
+        """
+
+        client_container :object = self.client.get_container_client(container= container if container else self.container)
+
+        if not parallel:
+            for page in self._list_pages(client_container, folder):
+                yield from page
+            return
+
+        sub_folders : List[str] = []
+        for item in client_container.walk_blobs(name_starts_with=shard_prefix(folder), delimiter="/"):
+            if isinstance(item, BlobPrefix):
+                sub_folders.append(item.name)
+            else:
+                yield item.name
+
+        yield from iter_parallel(partial(self._list_pages, client_container), sub_folders, max_workers=max_workers)
+
+    def _list_pages(self, client_container:object, prefix:str=None)->Iterator[List[str]]:
+
+        """
+        PAGES OF BLOB NAMES UNDER A PREFIX
+        """
+
+        for page in client_container.list_blobs(name_starts_with=prefix).by_page():
+            yield [x.name for x in page]
+
+    def list_new_files(self,
+                       folder:str=None,
+                       cursor:str=None,
+                       container:str=None)->Tuple[List, str]:
+
+        """
+        FUNCTION TO LIST ONLY THE FILES ADDED AFTER THE PREVIOUS RUN
+        The cursor keeps the continuation marker of the last listed page, the
+        last blob name and the newest last-modified time. Listing resumes from
+        that page for names after the last one, and the shard (sub folder) of the
+        last name is listed again so blobs added late to it, sorting before the
+        last name, are picked up by their last-modified time.
+        Limitation: blobs added late to an older shard are still not listed,
+        a full ingestion picks them up
+        :params folder : To returns only the files present in a specific folder
+        :params cursor : cursor returned by the previous run
+        :params container : container where files are
+        :return: new files and the cursor to store for the next run
+        """
+
+        state : dict = load_cursor(cursor)
+        last_name : str = state.get("last")
+        page_marker : str = state.get("marker")
+        watermark : datetime = isoparse(state["modified"]) if state.get("modified") else None
+
         client_container :object = self.client.get_container_client(container= container if container else self.container)
 
-        if folder:
-            files = [x.name for x in client_container.list_blobs(name_starts_with=folder)]
-        else:
-            files = [x.name for x in client_container.list_blobs()]
+        files : Dict[str, None] = {}
+        if last_name:
+            for blob in client_container.list_blobs(name_starts_with=last_shard(last_name, folder)):
+                if is_new(blob.name, blob.last_modified, state):
+                    files[blob.name] = None
+                watermark = max(watermark, blob.last_modified) if watermark else blob.last_modified
+
+        pages = client_container.list_blobs(name_starts_with=folder).by_page(continuation_token=page_marker)
+        for page in pages:
+            for blob in page:
+                if is_new(blob.name, blob.last_modified, state):
+                    files[blob.name] = None
+                last_name = max(last_name, blob.name) if last_name else blob.name
+                watermark = max(watermark, blob.last_modified) if watermark else blob.last_modified
+
+            if pages.continuation_token:
+                page_marker = pages.continuation_token
 
-        return files
\ No newline at end of file
+        return list(files), json.dumps({"marker": page_marker,
+                                        "last": last_name,
+                                        "modified": watermark.isoformat() if watermark else None})
@@ -1,5 +1,8 @@
 import os
-from typing import List
+import io
+from typing import List, Tuple, Dict, Iterator
+from connector.ttl_cache import TTLCache
+from dateutil.parser import isoparse
 import boxsdk
 from boxsdk.object.item import Item
 from collections.abc import Iterable
@@ -9,12 +12,20 @@ class BoxConnector:
 
     __connector_name__ = "Box Storage"
 
+    # Box download urls expire after ~15 minutes
+    LINK_TTL : float = 10 * 60
+    # Folder and file ids kept without searching Box again
+    ID_TTL : float = 60 * 60
+
     def __init__(
         self,
         jwt_auth: boxsdk.JWTAuth = None,
     ) -> None:
         self.auth = Environments.get_box_token()
         self.client = self._build_client()
+        self._links : TTLCache = TTLCache()
+        self._folder_ids : TTLCache = TTLCache()
+        self._file_ids : TTLCache = TTLCache()
 
 
     def _build_client(self):
@@ -100,10 +111,7 @@ class BoxConnector:
         ancestor_folder = []
 
         if parent_folder:
-            folder = self.search_for_folder(
-                parent_folder, exact_match=True, enforce_single_result=True
-            )[0]
-            ancestor_folder.append(folder)
+            ancestor_folder.append(self.client.folder(self.get_folder_id(parent_folder)))
 
         files = list(
             self.search_for_item(
@@ -144,38 +152,126 @@ class BoxConnector:
         )
         return folders
 
-    def upload_file(self, filepath:str, filename:str, folder_name:str):
+    def get_folder_id(self, folder_name: str) -> str:
+        """
+        Id of a Box folder, searched once and cached for ID_TTL seconds
+        :param folder_name: Name of Box folder
+        """
+        return self._folder_ids.get_or_set(folder_name, lambda: (
+            self.search_for_folder(folder_name, exact_match=True, enforce_single_result=True)[0].id,
+            BoxConnector.ID_TTL,
+        ))
+
+    def get_file_id(self, folder_name: str, filename: str) -> str:
+        """
+        Id of a file in a Box folder, searched once and cached for ID_TTL seconds
+        :param folder_name: Name of Box folder that contains the file
+        :param filename: Name of the file
+        """
+        return self._file_ids.get_or_set((folder_name, filename), lambda: (
+            self.search_for_file(filename, folder_name, exact_match=True, enforce_single_result=True)[0].id,
+            BoxConnector.ID_TTL,
+        ))
+
+    def _uploaded(self, folder_name: str, filename: str, uploaded_file: Item) -> None:
+        """
+        Cache the id of an uploaded file and drop the links of its previous version
+        """
+        self._file_ids.set((folder_name, filename), uploaded_file.id, BoxConnector.ID_TTL)
+        self._links.invalidate((folder_name, filename))
+
+    def upload_file(self, filepath:str, filename:str, folder_name:str=None):
 
         """
-        Upload a file to a given Box folder.
+        Upload a file to a given Box folder, a file already uploaded
+        through this connector is updated in place by id.
+        Errors are raised so callers can retry throttled (429) uploads.
         :param filepath: local filepath of the data to upload
+        :param filename: Name to assign to file on upload, or folder_name/filename
+                         when folder_name is not given (same call as the other connectors)
         :param folder_name: Name of Box folder to upload into
-        :param filename: Name to assign to file on upload
         :return: None
         """
-        try:
-            folder_search = self.search_for_folder(folder_name, exact_match=True, enforce_single_result=True)
-            target_folder = self.client.folder(folder_search[0].id)
-            uploaded_file = target_folder.upload(filepath, file_name=filename)
-        except Exception as e:
-            print(f"Error {str(e)}")
+        if folder_name is None:
+            folder_name, filename = os.path.split(filename)
+
+        file_id = self._file_ids.get((folder_name, filename))
+        if file_id:
+            uploaded_file = self.client.file(file_id).update_contents(filepath)
+        else:
+            uploaded_file = self.client.folder(self.get_folder_id(folder_name)).upload(filepath, file_name=filename)
+        self._uploaded(folder_name, filename, uploaded_file)
+
+    def upload_bytes(self, data:bytes, filename:str, folder_name:str=None):
+
+        """
+        Upload in memory data to a given Box folder.
+        :param data: bytes or file-like object to upload
+        :param filename: Name to assign to file on upload, or folder_name/filename
+                         when folder_name is not given (same call as the other connectors)
+        :param folder_name: Name of Box folder to upload into
+        :return: None
+        """
+        if folder_name is None:
+            folder_name, filename = os.path.split(filename)
+
+        stream = io.BytesIO(data) if isinstance(data, bytes) else data
+        file_id = self._file_ids.get((folder_name, filename))
+        if file_id:
+            uploaded_file = self.client.file(file_id).update_contents_with_stream(stream)
+        else:
+            uploaded_file = self.client.folder(self.get_folder_id(folder_name)).upload_stream(stream, file_name=filename)
+        self._uploaded(folder_name, filename, uploaded_file)
 
     def download_file(self,
                       folder_name: str,
                       filename: str,
-                      filepath: str):
+                      filepath: str = None):
         """
         Downloads a file to a given path.
+        Also accepts download_file(folder_name/filename, filepath), the call
+        used with the other connectors.
         :param folder_name: Name of Box folder that contains the file
-        :param blob_name: Name of blob to get from the folder
+        :param filename: Name of the file to get from the folder
         :param filepath: Name of local file to be generated
         """
-        files = self.search_for_file(
-            filename, folder_name, exact_match=True, enforce_single_result=True
-        )
+        if filepath is None:
+            filepath = filename
+            folder_name, filename = os.path.split(folder_name)
+
+        self.download_file_by_id(self.get_file_id(folder_name, filename), filepath)
 
+    def download_file_by_id(self, file_id: str, filepath: str):
+        """
+        Downloads a file to a given path from its Box id.
+        :param file_id: Box id of the file
+        :param filepath: Name of local file to be generated
+        """
         with open(filepath, "wb") as of:
-            files[0].download_to(of)
+            self.client.file(file_id).download_to(of)
+
+    def get_file_properties(self, filepath: str) -> dict:
+        """
+        Get size and content hash of a file.
+        :param filepath: folder_name/filename of the file in Box
+        :return: {"size": ..., "etag": ...}
+        """
+        box_file = self.client.file(self.get_file_id(*os.path.split(filepath))).get(fields=["size", "sha1"])
+        return {"size": box_file.size, "etag": box_file.sha1}
+
+    def read_range(self,
+                   filepath: str,
+                   offset: int,
+                   length: int) -> bytes:
+        """
+        Read a byte range of a file.
+        :param filepath: folder_name/filename of the file in Box
+        :param offset: first byte to read
+        :param length: number of bytes to read
+        :return: bytes read
+        """
+        box_file = self.client.file(self.get_file_id(*os.path.split(filepath)))
+        return box_file.content(byte_range=(offset, offset + length - 1))
 
     def get_list_of_files(self,
                           folder_name,
@@ -189,26 +285,95 @@ class BoxConnector:
         :param include_folders: return sub-folders
         :return: List[boxsdk.object.item.Item]
         """
-        folder = self.search_for_folder(
-            folder_name=folder_name, exact_match=True, enforce_single_result=True
-        )[0]
+        return list(self.iter_list_of_files(folder_name, include_folders, **kwargs))
 
-        files : List[Item] = [
-            x
-            for x in folder.get_items()
-            if (x.object_type != "folder" and not include_folders) or include_folders
-        ]
+    def iter_list_of_files(self,
+                           folder_name,
+                           include_folders: bool = False,
+                           page_size: int = 1000,
+                           **kwargs
+                    ) -> Iterator[Item]:
+        """
+        List the items of a Box folder page by page, caching the ids of the files
 
-        return files
+        :param folder_name: name of Box folder
+        :param include_folders: return sub-folders
+        :param page_size: number of items requested per page
+        :return: Iterator[boxsdk.object.item.Item]
+        """
+        folder = self.client.folder(self.get_folder_id(folder_name))
+
+        for item in folder.get_items(limit=page_size, **kwargs):
+            if item.object_type == "folder" and not include_folders:
+                continue
+            if item.object_type == "file":
+                self._file_ids.set((folder_name, item.name), item.id, BoxConnector.ID_TTL)
+            yield item
+
+    def iter_list_files(self,
+                        folder: str = None,
+                        container: str = None,
+                        parallel: bool = False,
+                        max_workers: int = 8) -> Iterator[str]:
+        """
+        List the files of a Box folder as folder/name paths
+        :param folder: name of Box folder
+        :param container: unused, kept for a common connector signature
+        :param parallel: unused, Box folders are listed page by page
+        :param max_workers: unused
+        """
+        for item in self.iter_list_of_files(folder, fields=["name"]):
+            yield f"{folder}/{item.name}"
+
+    def list_new_files(self,
+                       folder:str=None,
+                       cursor:str=None,
+                       container:str=None)->Tuple[List[str], str]:
+        """
+        List the files of a Box folder modified after the previous run
+        :param folder: name of Box folder
+        :param cursor: last-modified watermark (ISO datetime) of the previous run
+        :param container: unused, kept for a common connector signature
+        :return: new files as folder/name and the watermark to store for the next run
+        """
+        watermark = isoparse(cursor) if cursor else None
+        files : List[str] = []
+
+        for item in self.iter_list_of_files(folder, fields=["name", "modified_at"]):
+            modified_at = isoparse(item.modified_at)
+            if watermark is None or modified_at > watermark:
+                files.append(f"{folder}/{item.name}")
+                if cursor is None or modified_at > isoparse(cursor):
+                    cursor = item.modified_at
+
+        return files, cursor
 
     def generate_public_link(self,
                               folder_name: str,
                               filename: str):
+        """
+        Get the download url of a file, cached while Box keeps it valid
+        :param folder_name: Name of Box folder that contains the file
+        :param filename: Name of the file
+        """
 
-        files = self.search_for_file(
-            folder_name, filename, exact_match=True, enforce_single_result=True
-        )
-        url = files[0].get_download_url()
-        return url
+        def download_url():
+            box_file = self.client.file(self.get_file_id(folder_name, filename))
+            return box_file.get_download_url(), BoxConnector.LINK_TTL
+
+        return self._links.get_or_set((folder_name, filename), download_url)
 
+    def get_public_link(self, filepath: str) -> str:
+        """
+        :param filepath: folder_name/filename of the file in Box
+        """
+        folder_name, filename = os.path.split(filepath)
+        return self.generate_public_link(folder_name, filename)
 
+    def get_public_links(self, filepaths: List[str]) -> Dict[str, str]:
+        """
+        Get the download urls of many files
+        :param filepaths: folder_name/filename of the files in Box
+        :return: dict filepath -> url
+        """
+        return {filepath: self.get_public_link(filepath) for filepath in filepaths}
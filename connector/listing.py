@@ -0,0 +1,96 @@
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List
+from dateutil.parser import isoparse
+
+
+def shard_prefix(folder: str = None) -> str:
+    """
+    Folder used as prefix for sharded listing, sub folders (e.g. date folders) become the shards
+    """
+    return folder.rstrip("/") + "/" if folder else ""
+
+
+def iter_parallel(list_prefix: Callable[[str], Iterable[List[str]]],
+                  prefixes: List[str],
+                  max_workers: int = 8,
+                  max_pages: int = 64) -> Iterator[str]:
+    """
+    List many prefixes concurrently, yielding file names as pages arrive
+    :param list_prefix: function returning the pages (lists of names) of one prefix
+    :param prefixes: prefixes to list, one task per prefix
+    :param max_workers: number of prefixes listed at the same time
+    :param max_pages: pages buffered before listing threads wait for the consumer
+    """
+    pages : queue.Queue = queue.Queue(maxsize=max_pages)
+    stop : threading.Event = threading.Event()
+    done : object = object()
+
+    def put(item) -> None:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def worker(prefix: str) -> None:
+        try:
+            for page in list_prefix(prefix):
+                if stop.is_set():
+                    return
+                put(page)
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(worker, prefix) for prefix in prefixes]
+        try:
+            remaining : int = len(futures)
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                    continue
+                yield from page
+
+            for future in futures:
+                future.result()
+        finally:
+            stop.set()
+
+
+def load_cursor(cursor: str = None) -> dict:
+    """
+    State of an incremental listing cursor, a plain key stored by older runs is the last key
+    """
+    if not cursor:
+        return {}
+    if cursor.startswith("{"):
+        return json.loads(cursor)
+    return {"last": cursor}
+
+
+def last_shard(last_key: str = None, folder: str = None) -> str:
+    """
+    Prefix (sub folder) of the last key listed, re-listed on every run so files
+    added late to the newest shard are not skipped
+    """
+    if not last_key or "/" not in last_key[len(shard_prefix(folder)):]:
+        return shard_prefix(folder)
+    return last_key.rsplit("/", 1)[0] + "/"
+
+
+def is_new(key: str, modified: datetime, state: dict) -> bool:
+    """
+    True when a listed file was not seen by the previous run: its key sorts after
+    the last key or it was modified after the watermark of the previous run
+    """
+    if not state.get("last"):
+        return True
+    if key > state["last"]:
+        return True
+    return bool(state.get("modified")) and modified > isoparse(state["modified"])
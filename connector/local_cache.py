@@ -0,0 +1,122 @@
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict
+
+
+class LocalFileCache:
+
+    """
+    Content-addressed on-disk cache of storage files.
+    Files are keyed by storage path + ETag/size, so a changed object is fetched again
+    and two paths with the same file name never collide. Files past max_bytes are
+    evicted least recently used first, files acquired and not yet released are never evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+
+        self.directory : str = directory
+        self.max_bytes : int = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks : Dict[str, threading.Lock] = {}
+        self._pins : Dict[str, int] = {}
+        self._entries : OrderedDict = self._load_entries()
+
+    def _load_entries(self) -> OrderedDict:
+        """
+        Index the files already in the cache directory, oldest used first.
+        Use is tracked with the access time, modification times are left untouched
+        """
+        files = [f for f in os.scandir(self.directory) if f.is_file() and not f.name.endswith(".part")]
+        files.sort(key=lambda f: f.stat().st_atime)
+        return OrderedDict((f.name, f.stat().st_size) for f in files)
+
+    def _cache_name(self, path: str, properties: Dict) -> str:
+        """
+        Name of the cached file, the original extension is kept for format detection
+        """
+        key : str = f"{path}|{properties.get('etag')}|{properties.get('size')}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + os.path.splitext(path)[1]
+
+    def _key_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(name, threading.Lock())
+
+    @property
+    def size(self) -> int:
+        return sum(self._entries.values())
+
+    def acquire(self, path: str, properties: Dict, fetch: Callable[[str], None]) -> str:
+        """
+        Return the local path of a storage file, fetching it on a cache miss.
+        The file is pinned until release is called with the returned path
+        :param path: path of the file in storage
+        :param properties: {"etag": ..., "size": ...} of the file in storage
+        :param fetch: function downloading the file to the local path it receives
+        """
+        name : str = self._cache_name(path, properties)
+        local_path : str = os.path.join(self.directory, name)
+
+        with self._key_lock(name):
+            with self._lock:
+                self._pins[name] = self._pins.get(name, 0) + 1
+                cached : bool = name in self._entries and os.path.exists(local_path)
+                if cached:
+                    self._entries.move_to_end(name)
+
+            if cached:
+                os.utime(local_path, ns=(time.time_ns(), os.stat(local_path).st_mtime_ns))
+                return local_path
+
+            partial_path : str = local_path + ".part"
+            try:
+                fetch(partial_path)
+                os.replace(partial_path, local_path)
+            except Exception:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                self.release(local_path)
+                raise
+
+            with self._lock:
+                self._entries[name] = os.path.getsize(local_path)
+                self._evict()
+
+        return local_path
+
+    def release(self, local_path: str) -> None:
+        """
+        Unpin a file returned by acquire, making it evictable
+        """
+        name : str = os.path.basename(local_path)
+
+        with self._lock:
+            pins : int = self._pins.get(name, 0) - 1
+            if pins > 0:
+                self._pins[name] = pins
+            else:
+                self._pins.pop(name, None)
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Remove least recently used files not pinned until the cache fits in max_bytes,
+        must be called holding self._lock
+        """
+        total : int = self.size
+
+        for name in list(self._entries):
+            if total <= self.max_bytes:
+                return
+            if name in self._pins:
+                continue
+
+            total -= self._entries.pop(name)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
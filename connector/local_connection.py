@@ -0,0 +1,205 @@
+import os
+import shutil
+from pathlib import Path
+from urllib.parse import quote
+from typing import List, Tuple, Dict, Iterator
+from environments.environments import Environments
+
+class LocalConnector:
+
+    __connector_name__ = "Local Storage"
+
+    def __init__(self) -> None:
+
+        self.root : str = Environments.get_local_path()
+        self.public_url : str = Environments.get_local_public_url()
+
+        if not self.root:
+            raise ValueError("Missing required attributes: ['LOCAL_PATH']")
+
+    def _path(self, name: str, container: str = None) -> str:
+        """
+        Absolute path of a file in storage, container is a sub directory of LOCAL_PATH
+        """
+        return os.path.join(self.root, container, name) if container else os.path.join(self.root, name)
+
+    def _link_or_copy(self, source: str, target: str, link: bool = True) -> None:
+        """
+        Hardlink source to target, copying when both are not in the same filesystem
+        or when link is False. The target is replaced atomically so readers never
+        see a partial file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        partial_path : str = target + ".part"
+
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+        if not link:
+            shutil.copyfile(source, partial_path)
+        else:
+            try:
+                os.link(source, partial_path)
+            except OSError:
+                shutil.copyfile(source, partial_path)
+
+        os.replace(partial_path, target)
+
+    def upload_file(self,
+                    file_path: str,
+                    blob_name: str,
+                    container: str = None):
+        """
+        Store a local file, without copying data when possible. The stored file
+        shares its data with file_path, which must only be replaced (as the cutter
+        does) and never rewritten in place afterwards
+        :params file_path : path to file to be uploaded
+        :params blob_name : path of file in storage
+        :params container : sub directory of LOCAL_PATH
+        """
+        self._link_or_copy(file_path, self._path(blob_name, container))
+
+    def upload_bytes(self,
+                     data: bytes,
+                     blob_name: str,
+                     container: str = None):
+        """
+        Store in memory data
+        :params data : bytes or file-like object to be uploaded
+        :params blob_name : path of file in storage
+        :params container : sub directory of LOCAL_PATH
+        """
+        target : str = self._path(blob_name, container)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with open(target + ".part", "wb") as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f)
+
+        os.replace(target + ".part", target)
+
+    def delete_file(self,
+                    blob_name: str,
+                    container: str = None):
+        """
+        Delete a file from storage
+        :params blob_name : path of file in storage
+        :params container : sub directory of LOCAL_PATH
+        """
+        try:
+            os.remove(self._path(blob_name, container))
+        except Exception as e:
+            print(f"Error occurred while deleting the file: {e}")
+
+    def download_file(self,
+                      blob_name: str,
+                      filepath: str,
+                      container: str = None):
+        """
+        Copy a file to filepath. Never hardlinked: a local copy may be touched or
+        rewritten (cache hits, re-cut segments) and that must not change the
+        stored file or its mtime based ETag
+        :params blob_name : path of file in storage
+        :params filepath : local path to write the file
+        :params container : sub directory of LOCAL_PATH
+        """
+        self._link_or_copy(self._path(blob_name, container), filepath, link=False)
+
+    def get_file_properties(self,
+                            blob_name: str,
+                            container: str = None) -> dict:
+        """
+        Size and modification based ETag of a file
+        :params blob_name : path of file in storage
+        :params container : sub directory of LOCAL_PATH
+        """
+        stat = os.stat(self._path(blob_name, container))
+        return {"size": stat.st_size, "etag": f"{stat.st_mtime_ns}-{stat.st_size}"}
+
+    def read_range(self,
+                   blob_name: str,
+                   offset: int,
+                   length: int,
+                   container: str = None) -> bytes:
+        """
+        Read a byte range of a file
+        :params blob_name : path of file in storage
+        :params offset : first byte to read
+        :params length : number of bytes to read
+        :params container : sub directory of LOCAL_PATH
+        """
+        with open(self._path(blob_name, container), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get_public_link(self,
+                        blob_name: str,
+                        container: str = None) -> str:
+        """
+        Link to a file, served from LOCAL_PUBLIC_URL when set (e.g. a local http server
+        on LOCAL_PATH) or as a file:// uri otherwise
+        :params blob_name : path of file in storage
+        :params container : sub directory of LOCAL_PATH
+        """
+        if self.public_url:
+            name : str = f"{container}/{blob_name}" if container else blob_name
+            return self.public_url.rstrip("/") + "/" + quote(name)
+
+        return Path(os.path.abspath(self._path(blob_name, container))).as_uri()
+
+    def get_public_links(self,
+                         blob_names: List[str],
+                         container: str = None) -> Dict[str, str]:
+
+        return {blob_name: self.get_public_link(blob_name, container) for blob_name in blob_names}
+
+    def get_list_files(self,
+                       container: str = None,
+                       folder: str = None) -> list:
+
+        return list(self.iter_list_files(folder=folder, container=container))
+
+    def iter_list_files(self,
+                        folder: str = None,
+                        container: str = None,
+                        parallel: bool = False,
+                        max_workers: int = 8) -> Iterator[str]:
+        """
+        List the files of a folder as paths relative to LOCAL_PATH (or container)
+        :params folder : To returns only the files present in a specific folder
+        :params container : sub directory of LOCAL_PATH
+        :params parallel : unused, local listing is not network bound
+        :params max_workers : unused
+        """
+        base : str = self._path("", container)
+
+        for directory, sub_folders, files in os.walk(os.path.join(base, folder) if folder else base):
+            sub_folders.sort()
+            for name in sorted(files):
+                if not name.endswith(".part"):
+                    yield Path(os.path.relpath(os.path.join(directory, name), base)).as_posix()
+
+    def list_new_files(self,
+                       folder: str = None,
+                       cursor: str = None,
+                       container: str = None) -> Tuple[List[str], str]:
+        """
+        List the files modified after the previous run
+        :params folder : To returns only the files present in a specific folder
+        :params cursor : modification time watermark (ns) of the previous run
+        :params container : sub directory of LOCAL_PATH
+        :return: new files and the watermark to store for the next run
+        """
+        watermark : int = int(cursor) if cursor else -1
+        newest : int = watermark
+        files : List[str] = []
+
+        for name in self.iter_list_files(folder=folder, container=container):
+            modified : int = os.stat(self._path(name, container)).st_mtime_ns
+            if modified > watermark:
+                files.append(name)
+                newest = max(newest, modified)
+
+        return files, str(newest) if newest >= 0 else cursor
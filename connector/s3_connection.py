@@ -1,8 +1,15 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
+import io
 from dateutil.relativedelta import relativedelta
 from environments.environments import Environments
 import datetime
-from typing import List
+from typing import List, Tuple, Dict, Iterator
+from functools import partial
+from connector.ttl_cache import TTLCache, LINK_TTL_RATIO
+from connector.listing import iter_parallel, shard_prefix, load_cursor, last_shard, is_new
+from dateutil.parser import isoparse
+import json
 
 class S3_Connector:
 
@@ -12,6 +19,8 @@ class S3_Connector:
 
         self.bucket :str = Environments.get_s3_bucket_name()
         self.client = self._build_client()
+        self.transfer_config = self._build_transfer_config()
+        self._links : TTLCache = TTLCache()
 
     def _build_client(self):
         """
@@ -28,6 +37,15 @@ class S3_Connector:
             endpoint_url=url_endpoint,
         )
 
+    def _build_transfer_config(self)->TransferConfig:
+        """
+        Multipart settings used by upload_file/download_file
+        """
+        return TransferConfig(multipart_threshold=Environments.get_transfer_multipart_threshold(),
+                              multipart_chunksize=Environments.get_transfer_chunk_size(),
+                              max_concurrency=Environments.get_transfer_max_concurrency(),
+                              use_threads=True)
+
     def upload_file(
             self,
             filepath: str,
@@ -42,19 +60,37 @@ class S3_Connector:
         :params bucket_name : Bucket to upload file
         :params filename : filename/filepath for file inside the bucket
 
+        Errors are raised so callers can retry throttled (SlowDown/503) transfers
         """
 
-        try:
-            self.client.upload_file(
-                Filename=filepath,
-                Bucket=bucket_name if bucket_name else self.bucket,
-                Key=filename if filename else filepath
-            )
-        except FileNotFoundError:
-            print("The file was not found")
+        self.client.upload_file(
+            Filename=filepath,
+            Bucket=bucket_name if bucket_name else self.bucket,
+            Key=filename if filename else filepath,
+            Config=self.transfer_config
+        )
 
-        except Exception as e:
-            print("Credentials not available")
+    def upload_bytes(
+            self,
+            data: bytes,
+            filename: str,
+            bucket_name: str =None,
+        ) -> None:
+
+        """
+        FUNCTION TO UPLOAD IN MEMORY DATA TO BUCKET
+
+        :params data : bytes or file-like object to be uploaded
+        :params filename : filename/filepath for file inside the bucket
+        :params bucket_name : Bucket to upload file
+        """
+
+        self.client.upload_fileobj(
+            Fileobj=io.BytesIO(data) if isinstance(data, bytes) else data,
+            Bucket=bucket_name if bucket_name else self.bucket,
+            Key=filename,
+            Config=self.transfer_config
+        )
 
     def delete_file(self,
                        filename:str ,
@@ -84,14 +120,44 @@ class S3_Connector:
         :param bucket_name: Name of the S3 bucket
         :param file_name: The file name to save the downloaded content locally
         """
-        try:
-            self.client.download_file(
-                Bucket=bucket if bucket else self.bucket,
-                Key=object_name,
-                Filename=filepath
-            )
-        except Exception as e:
-            print(f"Error: {str(e)}")
+        self.client.download_file(
+            Bucket=bucket if bucket else self.bucket,
+            Key=object_name,
+            Filename=filepath,
+            Config=self.transfer_config
+        )
+
+    def get_file_properties(self,
+                            object_name: str,
+                            bucket: str = None) -> dict:
+        """
+        Function to get size and ETag of a file (object).
+
+        :param object_name: Name of the file (object) in S3
+        :param bucket: Name of the S3 bucket
+        :return: {"size": ..., "etag": ...}
+        """
+        response = self.client.head_object(Bucket=bucket if bucket else self.bucket, Key=object_name)
+        return {"size": response["ContentLength"], "etag": response["ETag"]}
+
+    def read_range(self,
+                   object_name: str,
+                   offset: int,
+                   length: int,
+                   bucket: str = None) -> bytes:
+        """
+        Function to read a byte range of a file (object) with an HTTP Range request.
+
+        :param object_name: Name of the file (object) in S3
+        :param offset: first byte to read
+        :param length: number of bytes to read
+        :param bucket: Name of the S3 bucket
+        :return: bytes read
+        """
+        response = self.client.get_object(Bucket=bucket if bucket else self.bucket,
+                                          Key=object_name,
+                                          Range=f"bytes={offset}-{offset + length - 1}")
+        return response["Body"].read()
 
     def get_list_of_files(self, bucket_name:str=None, folder:str=None)->List:
         """
@@ -102,28 +168,87 @@ class S3_Connector:
         :return: List of files (keys) in the folder
         """
         try:
-            s3_result = self.client.list_objects_v2(Bucket=bucket_name if bucket_name else self.bucket, Prefix=folder)
+            return list(self.iter_list_files(folder=folder, container=bucket_name))
 
-            file_list = []
-            for key in s3_result['Contents']:
-                if key["Size"]!=0:
-                    file_list.append(key['Key'])
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return None
 
-            while s3_result['IsTruncated']:
-                continuation_key = s3_result['NextContinuationToken']
+    def iter_list_files(self,
+                        folder:str=None,
+                        container:str=None,
+                        parallel:bool=False,
+                        max_workers:int=8)->Iterator[str]:
+        """
+        Function to list files in a specific S3 bucket, yielding keys as pages arrive.
 
-                s3_result = self.client.list_objects_v2(Bucket=bucket_name if bucket_name else self.bucket,
-                                                        Prefix=folder,
-                                                        ContinuationToken=continuation_key)
-                for key in s3_result['Contents']:
-                    if key["Size"] != 0:
-                        file_list.append(key['Key'])
+        :param folder: Folder (prefix) to list files from
+        :param container: Name of the S3 bucket
+        :param parallel: list every sub folder of folder (e.g. date folders) concurrently
+        :param max_workers: number of sub folders listed at the same time
+        :return: iterator of files (keys) in the folder
+        """
+        bucket : str = container if container else self.bucket
 
-            return file_list
+        if not parallel:
+            for page in self._list_pages(bucket, folder if folder else ""):
+                yield from page
+            return
 
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            return None
+        prefix : str = shard_prefix(folder)
+        sub_folders : List[str] = []
+
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+            sub_folders.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+            yield from (key["Key"] for key in page.get("Contents", []) if key["Size"] != 0)
+
+        yield from iter_parallel(partial(self._list_pages, bucket), sub_folders, max_workers=max_workers)
+
+    def _list_pages(self, bucket:str, prefix:str)->Iterator[List[str]]:
+        """
+        Pages of non empty keys under a prefix
+        """
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            yield [key["Key"] for key in page.get("Contents", []) if key["Size"] != 0]
+
+    def list_new_files(self,
+                       folder:str=None,
+                       cursor:str=None,
+                       container:str=None)->Tuple[List, str]:
+        """
+        List only the keys added after the previous run.
+        S3 returns keys in lexicographic order, so listing starts at the shard
+        (sub folder) of the last key listed: keys after it are new, and keys of
+        that shard sorting before it are new when modified after the watermark,
+        so late files of the newest shard (e.g. alpha.wav added after zeta.wav
+        in today's date folder) are not skipped.
+        Limitation: files added late to an older shard are still not listed,
+        a full ingestion picks them up.
+
+        :param folder: Folder (prefix) to list files from
+        :param cursor: cursor returned by the previous run (or the last key of older runs)
+        :param container: Name of the S3 bucket
+        :return: new files (keys) and the cursor to store for the next run
+        """
+        state : dict = load_cursor(cursor)
+        params : dict = {"Bucket": container if container else self.bucket,
+                         "Prefix": folder if folder else ""}
+        if state.get("last"):
+            params["StartAfter"] = last_shard(state["last"], folder)
+
+        file_list : List = []
+        last_key : str = state.get("last")
+        watermark : datetime.datetime = isoparse(state["modified"]) if state.get("modified") else None
+
+        for page in self.client.get_paginator("list_objects_v2").paginate(**params):
+            for key in page.get("Contents", []):
+                if key["Size"] != 0 and is_new(key["Key"], key["LastModified"], state):
+                    file_list.append(key["Key"])
+                last_key = max(last_key, key["Key"]) if last_key else key["Key"]
+                watermark = max(watermark, key["LastModified"]) if watermark else key["LastModified"]
+
+        return file_list, json.dumps({"last": last_key,
+                                      "modified": watermark.isoformat() if watermark else None})
 
     def generate_public_link(
         self,
@@ -134,22 +259,41 @@ class S3_Connector:
 
         """
         Function to generate a pre-signed URL to share an S3 object.
+        URLs are cached until shortly before they expire.
 
+        :param filepath: Name of the file in S3
         :param bucket: Name of the S3 bucket
-        :param filename: Name of the file in S3
-        :param expiration: Time in seconds for the presigned URL to remain valid (default is 3600 seconds or 1 hour)
-        :return: Presigned URL as a string. If error, returns None.
+        :param duration: Time for the presigned URL to remain valid (default is 1 month)
+        :return: Presigned URL as a string.
         """
 
+        bucket = bucket if bucket else self.bucket
+        return self._links.get_or_set((bucket, filepath, str(duration)),
+                                      lambda: self._presign_url(filepath, bucket, duration))
+
+    def get_public_link(self, filepath: str, bucket: str = None) -> str:
+        return self.generate_public_link(filepath, bucket)
 
-        now : datetime = datetime.now()
-        expiration_datetime :datetime = now + duration
+    def get_public_links(self, filepaths: List[str], bucket: str = None) -> Dict[str, str]:
+        """
+        Function to generate pre-signed URLs for many S3 objects.
+
+        :param filepaths: Names of the files in S3
+        :param bucket: Name of the S3 bucket
+        :return: dict filepath -> presigned URL
+        """
+        return {filepath: self.generate_public_link(filepath, bucket) for filepath in filepaths}
+
+    def _presign_url(self, filepath: str, bucket: str, duration: relativedelta) -> Tuple[str, float]:
+
+        now : datetime.datetime = datetime.datetime.now()
+        expiration_datetime : datetime.datetime = now + duration
         duration_timedelta = expiration_datetime - now
         duration_seconds = duration_timedelta.days * 24 * 3600 + duration_timedelta.seconds
 
-        return self.client.generate_presigned_url(
+        url : str = self.client.generate_presigned_url(
             "get_object",
-            Params={"Bucket": bucket if bucket else self.bucket, "Key": filepath},
+            Params={"Bucket": bucket, "Key": filepath},
             ExpiresIn=duration_seconds,
         )
-
+        return url, duration_seconds * LINK_TTL_RATIO
@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+THROTTLE_STATUS : Tuple = (429, 503)
+THROTTLE_CODES : Tuple = ("SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded",
+                          "ServerBusy", "TooManyRequests", "rate_limit_exceeded")
+
+
+def is_throttled(error: Exception) -> bool:
+    """
+    True when a storage error is a throttle response (HTTP 429/503 or a throttle error code)
+    of Azure (HttpResponseError), S3 (botocore ClientError) or Box (BoxAPIException).
+    Wrapping errors are followed through __cause__/__context__, boto3 transfers raise
+    S3UploadFailedError from the ClientError
+    """
+    seen : set = set()
+
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+
+        status = getattr(error, "status_code", None) or getattr(error, "status", None)
+
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):
+            status = status or response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            code = response.get("Error", {}).get("Code")
+        else:
+            code = getattr(error, "error_code", None) or getattr(error, "code", None)
+
+        if status in THROTTLE_STATUS or code in THROTTLE_CODES:
+            return True
+
+        error = error.__cause__ or error.__context__
+
+    return False
+
+
+class AdaptiveTransferScheduler:
+
+    """
+    Run transfers with a concurrency limit adjusted AIMD style: the limit grows by one
+    while the aggregate throughput keeps improving and is halved on every throttle
+    response, throttled transfers are retried after a backoff. Largest transfers are
+    started first so the long tail is made of small files.
+    """
+
+    def __init__(self,
+                 min_workers: int = 2,
+                 max_workers: int = 32,
+                 max_retries: int = 5,
+                 backoff: float = 1.0,
+                 gain: float = 0.05) -> None:
+        """
+        :param min_workers: initial and lowest concurrency
+        :param max_workers: highest concurrency
+        :param max_retries: retries of a throttled transfer before giving up
+        :param backoff: base seconds to wait after a throttle response, doubled per retry
+        :param gain: relative throughput improvement needed to keep growing the limit
+        """
+        self.min_workers : int = max(min_workers, 1)
+        self.max_workers : int = max(max_workers, self.min_workers)
+        self.max_retries : int = max_retries
+        self.backoff : float = backoff
+        self.gain : float = gain
+        self.limit : int = self.min_workers
+
+    def _reset_window(self) -> None:
+        self._window_start : float = time.monotonic()
+        self._window_bytes : int = 0
+        self._window_done : int = 0
+
+    def _on_success(self, size: int) -> None:
+        """
+        Additive increase, evaluated once per window of `limit` completed transfers
+        """
+        self._window_bytes += size
+        self._window_done += 1
+
+        if self._window_done < self.limit:
+            return
+
+        throughput : float = self._window_bytes / max(time.monotonic() - self._window_start, 1e-6)
+        if throughput > self._throughput * (1 + self.gain):
+            self.limit = min(self.limit + 1, self.max_workers)
+        self._throughput = max(self._throughput, throughput)
+        self._reset_window()
+
+    def _on_throttle(self) -> None:
+        """
+        Multiplicative decrease, the throughput reference is dropped since the
+        storage capacity just changed
+        """
+        self.limit = max(self.limit // 2, self.min_workers)
+        self._throughput = 0.0
+        self._reset_window()
+
+    def run(self,
+            transfer: Callable,
+            items: Iterable,
+            size: Callable[[object], int] = lambda item: 0) -> Iterator[Tuple[object, Exception]]:
+        """
+        Transfer every item, yielding (item, error) as they finish, error is None on success
+        :param transfer: function transferring one item
+        :param items: items to transfer
+        :param size: bytes (or any proportional measure) of an item
+        """
+        # smallest first, tasks are popped from the end
+        pending : List[Tuple[int, object, int]] = sorted(((size(item), item, 0) for item in items),
+                                                         key=lambda task: task[0])
+        running : Dict = {}
+        resume_at : float = 0.0
+        self._throughput : float = 0.0
+        self._reset_window()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+
+                while pending and len(running) < self.limit and time.monotonic() >= resume_at:
+                    task = pending.pop()
+                    running[executor.submit(transfer, task[1])] = task
+
+                if not running:
+                    time.sleep(max(resume_at - time.monotonic(), 0))
+                    continue
+
+                timeout = max(resume_at - time.monotonic(), 0) if pending and len(running) < self.limit else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item_size, item, attempts = running.pop(future)
+                    error = future.exception()
+
+                    if error is None:
+                        self._on_success(item_size)
+                        yield item, None
+                    elif is_throttled(error) and attempts < self.max_retries:
+                        self._on_throttle()
+                        resume_at = max(resume_at, time.monotonic() + self.backoff * 2 ** attempts)
+                        pending.append((item_size, item, attempts + 1))
+                    else:
+                        yield item, error
@@ -0,0 +1,61 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Public links are cached for this fraction of their lifetime,
+# so a cached link is never handed out right before it expires
+LINK_TTL_RATIO : float = 0.9
+
+
+class TTLCache:
+
+    """
+    Thread safe in-memory cache where every entry expires after its own time to live
+    """
+
+    def __init__(self, max_entries: int = 100000) -> None:
+
+        self.max_entries : int = max_entries
+        self._lock = threading.Lock()
+        self._entries : Dict[Hashable, Tuple[Any, float]] = {}
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._remove_expired()
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (value, time.monotonic() + ttl)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Tuple[Any, float]]) -> Any:
+        """
+        Return the cached value of key, or build it with factory returning (value, ttl)
+        """
+        value = self.get(key)
+        if value is None:
+            value, ttl = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _remove_expired(self) -> None:
+        now : float = time.monotonic()
+        for key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+            del self._entries[key]
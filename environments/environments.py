@@ -24,7 +24,24 @@ class Environments:
                                }
 
     local_paramets : Dict = {
-        "local_path": os.getenv("LOCAL_PATH")
+        "local_path": os.getenv("LOCAL_PATH"),
+        "local_public_url": os.getenv("LOCAL_PUBLIC_URL")
+    }
+
+    transfer_parameters : Dict = {
+        "max_concurrency": int(os.getenv("TRANSFER_MAX_CONCURRENCY", 8)),
+        "chunk_size": int(os.getenv("TRANSFER_CHUNK_SIZE", 8 * 1024 * 1024)),
+        "multipart_threshold": int(os.getenv("TRANSFER_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+    }
+
+    listing_parameters : Dict = {
+        "parallel_listing": os.getenv("PARALLEL_LISTING", "false").lower() == "true",
+        "listing_workers": int(os.getenv("LISTING_WORKERS", 8))
+    }
+
+    cache_parameters : Dict = {
+        "cache_dir": os.getenv("CACHE_DIR", "audio_cache"),
+        "cache_max_bytes": int(os.getenv("CACHE_MAX_BYTES", 0))
     }
 
     db_parameters : Dict = {
@@ -40,8 +57,49 @@ class Environments:
                 "min_duration_off": 0.0
     }
 
+    segmentation_parameters : Dict = {
+        "segmentation_backend": os.getenv("SEGMENTATION_BACKEND", "api").lower(),
+        "segmentation_workers": int(os.getenv("SEGMENTATION_WORKERS", 4)),
+        "vad_energy_margin": float(os.getenv("VAD_ENERGY_MARGIN", 12.0)),
+        "vad_flux_ratio": float(os.getenv("VAD_FLUX_RATIO", 2.0)),
+        "vad_energy_hysteresis": float(os.getenv("VAD_ENERGY_HYSTERESIS", 6.0)),
+        "vad_min_duration_on": float(os.getenv("VAD_MIN_DURATION_ON", 0.25)),
+        "vad_min_duration_off": float(os.getenv("VAD_MIN_DURATION_OFF", 0.5))
+    }
+
+    cutter_parameters : Dict = {
+        "cut_mode": os.getenv("CUT_MODE", "memory"),
+        "cut_workers": int(os.getenv("CUT_WORKERS", 1)),
+        "cut_to_buffer": os.getenv("CUT_TO_BUFFER", "false").lower() == "true",
+        "cut_pipeline": os.getenv("CUT_PIPELINE", "false").lower() == "true",
+        "pipeline_in_flight": int(os.getenv("PIPELINE_IN_FLIGHT", 4)),
+        "download_workers": int(os.getenv("DOWNLOAD_WORKERS", 8)),
+        "upload_workers": int(os.getenv("UPLOAD_WORKERS", 8)),
+        "async_transfers": os.getenv("ASYNC_TRANSFERS", "false").lower() == "true",
+        "async_max_in_flight": int(os.getenv("ASYNC_MAX_IN_FLIGHT", 128)),
+        "adaptive_transfers": os.getenv("ADAPTIVE_TRANSFERS", "false").lower() == "true",
+        "transfer_min_workers": int(os.getenv("TRANSFER_MIN_WORKERS", 2)),
+        "transfer_max_workers": int(os.getenv("TRANSFER_MAX_WORKERS", 32)),
+        "normalize_audio": os.getenv("NORMALIZE_AUDIO", "false").lower() == "true",
+        "output_sample_rate": int(os.getenv("OUTPUT_SAMPLE_RATE", 16000)),
+        "output_format": os.getenv("OUTPUT_FORMAT", "WAV").upper()
+    }
+
     hugging_face_token : Dict = {"token": os.getenv("HUGGING_FACE_TOKEN")}
 
+    api_parameters : Dict = {
+        "pool_size": int(os.getenv("API_POOL_SIZE", 16)),
+        "connect_timeout": float(os.getenv("API_CONNECT_TIMEOUT", 10)),
+        "read_timeout": float(os.getenv("API_READ_TIMEOUT", 600)),
+        "retries": int(os.getenv("API_RETRIES", 5)),
+        "backoff_factor": float(os.getenv("API_BACKOFF_FACTOR", 0.5)),
+        "transcription_in_flight": int(os.getenv("TRANSCRIPTION_IN_FLIGHT", 8)),
+        "segmentation_in_flight": int(os.getenv("SEGMENTATION_IN_FLIGHT", 4)),
+        "commit_batch_size": int(os.getenv("COMMIT_BATCH_SIZE", 500)),
+        "transcription_batch_size": int(os.getenv("TRANSCRIPTION_BATCH_SIZE", 1)),
+        "transcription_batch_duration": float(os.getenv("TRANSCRIPTION_BATCH_DURATION", 300))
+    }
+
     Api_endpoints: Dict = {"PYANNOTATE": "http://127.0.0.1:8000",
                            "WHISPER": "http://127.0.0.1:5000"}
 
@@ -77,6 +135,14 @@ class Environments:
     def get_s3_url(cls)->str:
         return cls.s3_credentials.get("s3_url")
 
+    @classmethod
+    def get_local_path(cls)->str:
+        return cls.local_paramets.get("local_path")
+
+    @classmethod
+    def get_local_public_url(cls)->str:
+        return cls.local_paramets.get("local_public_url")
+
     @classmethod
     def get_db_engine(cls)->str:
         return cls.db_parameters.get("db_engine")
@@ -104,3 +170,143 @@ class Environments:
     @classmethod
     def get_api_endpoint(cls, endpoint:str)->str:
         return cls.Api_endpoints.get(endpoint,"None")
+
+    @classmethod
+    def get_cut_mode(cls)->str:
+        return cls.cutter_parameters.get("cut_mode")
+
+    @classmethod
+    def get_cut_workers(cls)->int:
+        return cls.cutter_parameters.get("cut_workers")
+
+    @classmethod
+    def get_async_transfers(cls)->bool:
+        return cls.cutter_parameters.get("async_transfers")
+
+    @classmethod
+    def get_async_max_in_flight(cls)->int:
+        return cls.cutter_parameters.get("async_max_in_flight")
+
+    @classmethod
+    def get_adaptive_transfers(cls)->bool:
+        return cls.cutter_parameters.get("adaptive_transfers")
+
+    @classmethod
+    def get_transfer_min_workers(cls)->int:
+        return cls.cutter_parameters.get("transfer_min_workers")
+
+    @classmethod
+    def get_transfer_max_workers(cls)->int:
+        return cls.cutter_parameters.get("transfer_max_workers")
+
+    @classmethod
+    def get_normalize_audio(cls)->bool:
+        return cls.cutter_parameters.get("normalize_audio")
+
+    @classmethod
+    def get_output_sample_rate(cls)->int:
+        return cls.cutter_parameters.get("output_sample_rate")
+
+    @classmethod
+    def get_output_format(cls)->str:
+        return cls.cutter_parameters.get("output_format")
+
+    @classmethod
+    def get_cut_to_buffer(cls)->bool:
+        return cls.cutter_parameters.get("cut_to_buffer")
+
+    @classmethod
+    def get_cut_pipeline(cls)->bool:
+        return cls.cutter_parameters.get("cut_pipeline")
+
+    @classmethod
+    def get_pipeline_in_flight(cls)->int:
+        return cls.cutter_parameters.get("pipeline_in_flight")
+
+    @classmethod
+    def get_download_workers(cls)->int:
+        return cls.cutter_parameters.get("download_workers")
+
+    @classmethod
+    def get_upload_workers(cls)->int:
+        return cls.cutter_parameters.get("upload_workers")
+
+    @classmethod
+    def get_api_pool_size(cls)->int:
+        return cls.api_parameters.get("pool_size")
+
+    @classmethod
+    def get_api_timeout(cls)->tuple:
+        return cls.api_parameters.get("connect_timeout"), cls.api_parameters.get("read_timeout")
+
+    @classmethod
+    def get_api_retries(cls)->int:
+        return cls.api_parameters.get("retries")
+
+    @classmethod
+    def get_api_backoff_factor(cls)->float:
+        return cls.api_parameters.get("backoff_factor")
+
+    @classmethod
+    def get_transcription_in_flight(cls)->int:
+        return cls.api_parameters.get("transcription_in_flight")
+
+    @classmethod
+    def get_segmentation_in_flight(cls)->int:
+        return cls.api_parameters.get("segmentation_in_flight")
+
+    @classmethod
+    def get_commit_batch_size(cls)->int:
+        return cls.api_parameters.get("commit_batch_size")
+
+    @classmethod
+    def get_transcription_batch_size(cls)->int:
+        return cls.api_parameters.get("transcription_batch_size")
+
+    @classmethod
+    def get_transcription_batch_duration(cls)->float:
+        return cls.api_parameters.get("transcription_batch_duration")
+
+    @classmethod
+    def get_transfer_max_concurrency(cls)->int:
+        return cls.transfer_parameters.get("max_concurrency")
+
+    @classmethod
+    def get_transfer_chunk_size(cls)->int:
+        return cls.transfer_parameters.get("chunk_size")
+
+    @classmethod
+    def get_transfer_multipart_threshold(cls)->int:
+        return cls.transfer_parameters.get("multipart_threshold")
+
+    @classmethod
+    def get_cache_dir(cls)->str:
+        return cls.cache_parameters.get("cache_dir")
+
+    @classmethod
+    def get_cache_max_bytes(cls)->int:
+        return cls.cache_parameters.get("cache_max_bytes")
+
+    @classmethod
+    def get_parallel_listing(cls)->bool:
+        return cls.listing_parameters.get("parallel_listing")
+
+    @classmethod
+    def get_listing_workers(cls)->int:
+        return cls.listing_parameters.get("listing_workers")
+
+    @classmethod
+    def get_segmentation_backend(cls)->str:
+        return cls.segmentation_parameters.get("segmentation_backend")
+
+    @classmethod
+    def get_segmentation_workers(cls)->int:
+        return cls.segmentation_parameters.get("segmentation_workers")
+
+    @classmethod
+    def get_vad_parameters(cls)->Dict:
+        return {"min_duration_on": cls.segmentation_parameters.get("vad_min_duration_on"),
+                "min_duration_off": cls.segmentation_parameters.get("vad_min_duration_off"),
+                "energy_margin": cls.segmentation_parameters.get("vad_energy_margin"),
+                "flux_ratio": cls.segmentation_parameters.get("vad_flux_ratio"),
+                "energy_hysteresis": cls.segmentation_parameters.get("vad_energy_hysteresis")}
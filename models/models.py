@@ -1,5 +1,6 @@
 from sqlalchemy import Column, String,ForeignKey,Float,Integer,create_engine
 import os
+from datetime import datetime
 from sqlalchemy.orm import declarative_base
 from sql.database import Config
 from environments.environments import Environments
@@ -93,6 +94,22 @@ class Audios_Transcriptions(EntityDboBase):
         self.Transcription = transcription
         self.Status = "Ingested"
 
+class Ingestion_Cursor(EntityDboBase):
+
+    __tablename__ = 'ingestion_cursors'
+
+    id = Column(Integer, primary_key = True)
+    Connector = Column(String)
+    Datasource = Column(String)
+    Cursor = Column(String)
+    Date = Column(String)
+
+    def __init__(self, Connector:str, Datasource:str, Cursor:str) -> None:
+        self.Connector = Connector
+        self.Datasource = Datasource
+        self.Cursor = Cursor
+        self.Date = datetime.utcnow().isoformat()
+
 config = Config(engine=Environments.get_db_engine())
 
 engine = create_engine(config.get_connection_string())
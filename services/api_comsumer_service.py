@@ -1,12 +1,71 @@
 from json import JSONDecodeError
 from environments.environments import Environments
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Tuple, Any, List, Dict
 
 class Api_Consumer:
 
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
     def __init__(self, endpoint:str):
         self._base_url = Environments.get_api_endpoint(endpoint=endpoint)
         self.API_KEY = Environments.get_hugging_face_token()
+        self.timeout = Environments.get_api_timeout()
+        self.session = self._build_session()
+
+    def _build_session(self)->requests.Session:
+        """
+        Create a keep-alive session with a connection pool to the api server,
+        retrying 429/5xx responses and connection errors with exponential backoff
+        """
+        pool_size : int = Environments.get_api_pool_size()
+
+        retries = Retry(total=Environments.get_api_retries(),
+                        backoff_factor=Environments.get_api_backoff_factor(),
+                        status_forcelist=Api_Consumer.RETRY_STATUS,
+                        allowed_methods=frozenset(["GET", "POST"]),
+                        respect_retry_after_header=True,
+                        raise_on_status=False)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.API_KEY}"
+        })
+        return session
+
+    def dispatch(self, func:Callable, items:Iterable, max_in_flight:int)->Iterator[Tuple[Any, Any, Exception]]:
+        """
+        Call func for every item from a thread pool keeping at most max_in_flight
+        calls pending, yielding (item, result, error) as calls complete so one
+        failing item never stops the others
+        :param func: function called with one item, e.g. one api request
+        :param items: items to process
+        :param max_in_flight: max number of concurrent calls
+        """
+        items = iter(items)
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            pending : dict = {executor.submit(func, item): item for item in islice(items, max_in_flight)}
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item = pending.pop(future)
+                    error : Exception = future.exception()
+                    yield item, None if error else future.result(), error
+
+                for item in islice(items, len(done)):
+                    pending[executor.submit(func, item)] = item
 
     def get_audio_segments(self, public_link:str, audio_id:int):
 
@@ -24,18 +83,25 @@ class Api_Consumer:
 
         return self.request("GET", path=path, payload=payload)
 
-    def request(self, request_type, path, payload):
+    def transcribe_audios(self, audios:List[Dict]):
+        """
+        Transcribe many audios in a single request
+        :param audios: list of {"audio_url": public link, "audio_id": id}
+        :return: list of {"audio_id": id, "transcription": text}
+        """
 
-        headers = {
-            "Accept": "application/json",
-            "Authorization": f"Bearer {self.API_KEY}"
-        }
+        path : str = "/transcription/batch"
+        payload = {"audios": audios}
+
+        return self.request("POST", path=path, payload=payload)
+
+    def request(self, request_type, path, payload):
 
         if payload:
-            response = requests.request(request_type, self._base_url + path, headers=headers, json=payload)
+            response = self.session.request(request_type, self._base_url + path, json=payload, timeout=self.timeout)
         else:
-            response =requests.request(request_type, self._base_url + path, headers=headers)
+            response = self.session.request(request_type, self._base_url + path, timeout=self.timeout)
         try:
             return response.json()
         except JSONDecodeError:
-            return response.text
\ No newline at end of file
+            return response.text
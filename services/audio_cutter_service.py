@@ -1,12 +1,19 @@
-import librosa
-from typing import List, Dict
+from typing import List, Dict, Tuple, Iterator, Set
 from models.models import AudioCollection,Audio_Segments, Cutted_Audios
 from multiprocessing.dummy import Pool as ThreadPool
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from itertools import repeat, islice
 from tqdm import tqdm
 import os
-import soundfile as sf
 import json
+from collections import defaultdict
+from environments.environments import Environments
+from services.cutting_engine import cut_audio, cut_audio_ranged, local_audio_path, output_settings
+from functools import partial
+from connector.local_cache import LocalFileCache
+from connector.async_connection import get_async_connector
+from connector.transfer_scheduler import AdaptiveTransferScheduler
+import asyncio
 
 class Audio_Cutter:
 
@@ -19,89 +26,374 @@ class Audio_Cutter:
         self._db = database
         self._con = connector
         self.logger = logger
-
-    def _get_data_to_cut(self)->List[Dict]:
-
-        audio_to_cut :List[Dict[str]] =[{
-                               "id": f.id,
-                               "Audio_name":f.Audio_name,
-                               "Filepath": f.Filepath} for f in self._db.get_all_from_model_with_status(model = AudioCollection, status=['Segmented'])]
-
-        return audio_to_cut
-
-    def _get_segments_audios(self)->List[Dict]:
-
-        segments_audios : List[Dict[str]] = [ { "Audio_id": f.Audio_id,
+        self.cut_mode = Environments.get_cut_mode()
+        self.cut_workers = Environments.get_cut_workers()
+        self.cut_to_buffer = Environments.get_cut_to_buffer()
+        self.pipeline = Environments.get_cut_pipeline()
+        self.pipeline_in_flight = Environments.get_pipeline_in_flight()
+        self.download_workers = Environments.get_download_workers()
+        self.upload_workers = Environments.get_upload_workers()
+        self.async_transfers = Environments.get_async_transfers()
+        self.async_max_in_flight = Environments.get_async_max_in_flight()
+        self.adaptive_transfers = Environments.get_adaptive_transfers()
+        self.transfer_min_workers = Environments.get_transfer_min_workers()
+        self.transfer_max_workers = Environments.get_transfer_max_workers()
+        self.output = output_settings(Environments.get_output_sample_rate(), Environments.get_output_format()) if Environments.get_normalize_audio() else None
+        self.chunk_size = Environments.get_commit_batch_size()
+        self.cache = self._build_cache()
+
+    def _build_cache(self)->LocalFileCache:
+        """
+        Local cache of source audios, disabled when CACHE_MAX_BYTES is 0
+        """
+        max_bytes : int = Environments.get_cache_max_bytes()
+        return LocalFileCache(Environments.get_cache_dir(), max_bytes) if max_bytes > 0 else None
+
+    def _get_data_to_cut(self)->Iterator[Dict]:
+
+        return ({"id": f.id,
+                 "Audio_name":f.Audio_name,
+                 "Filepath": f.Filepath} for f in self._db.iter_from_model_with_status(model = AudioCollection, status=['Segmented'], columns=["Audio_name", "Filepath"]))
+
+    def _chunk_audios(self, audios:Iterator[Dict])->Iterator[List[Dict]]:
+        """
+        Split the audios to cut in chunks of COMMIT_BATCH_SIZE, so a run holds
+        one chunk of audios and segments in memory whatever the backlog size
+        """
+        while True:
+            chunk : List[Dict] = list(islice(audios, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _get_segments_audios(self, audio_ids:List[int]=None)->Dict[int, List[Dict]]:
+        """
+        Return the segments ready to be cut grouped by Audio_id, so each
+        audio looks up its segments in O(1) instead of scanning them all
+        :param audio_ids: only the segments of these audios, all when None
+        """
+
+        filters : List = [Audio_Segments.Status.in_(['Ready_To_Cutted'])]
+        if audio_ids is not None:
+            filters.append(Audio_Segments.Audio_id.in_(audio_ids))
+
+        segments_audios : Dict[int, List[Dict]] = defaultdict(list)
+        for f in self._db.iter_from_model(model = Audio_Segments, filters=filters,
+                                          columns=["Audio_id", "Segment_number", "Start_time", "End_time"]):
+            segments_audios[f.Audio_id].append({"Audio_id": f.Audio_id,
                                                 "id": f.id,
                                                 "Segment_number": f.Segment_number,
                                                 "Start_time": f.Start_time,
-                                                "End_time": f.End_time} for f in self._db.get_all_from_model_with_status(model = Audio_Segments, status=['Ready_To_Cutted'])]
+                                                "End_time": f.End_time})
         return segments_audios
 
-    def _normalize_timestamp(self, timestamp: float, sampling_rate: int) -> float:
-        return int(timestamp * sampling_rate)
-
     def _download_audio(self, audio_file):
+        """
+        Download the source audio, or take it from the cache, and record its
+        local path in the audio dict
+        """
 
         audio_filepath : str = audio_file.get("Filepath")
-        audio_name : str = audio_file.get("Audio_name")
 
-        self._con.download_file(audio_filepath,"audios/{0}".format(audio_name))
+        if self.cache:
+            audio_file["Local_path"] = self.cache.acquire(audio_filepath,
+                                                          self._con.get_file_properties(audio_filepath),
+                                                          partial(self._con.download_file, audio_filepath))
+            return
+
+        local_path : str = local_audio_path(audio_file)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        self._con.download_file(audio_filepath, local_path)
+
+    def _release_audio(self, audio_file)->None:
+        """
+        Release the local source audio once cut, cached files stay on disk for reruns
+        """
+
+        if self.cache:
+            if audio_file.get("Local_path"):
+                self.cache.release(audio_file.pop("Local_path"))
+        else:
+            self._remove_local_file(local_audio_path(audio_file))
+
+    def _remove_local_file(self, filepath:str)->None:
+
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+
+    def _try_transfer(self, transfer, *args)->Exception:
+        """
+        Run one transfer of the fixed size pools, returning its error instead of
+        raising so a failed file does not stop the others
+        """
+
+        try:
+            transfer(*args)
+        except Exception as e:
+            return e
 
-    def _upload_audio(self, audio_file):
+    def _upload_audio(self, audio_file, data:bytes=None):
 
-        self._con.upload_file(audio_file.Filepath, audio_file.Filepath)
+        if data is None:
+            self._con.upload_file(audio_file.Filepath, audio_file.Filepath)
+        else:
+            self._con.upload_bytes(data, audio_file.Filepath)
+
+    async def _download_audio_async(self, connector:object, audio_file:Dict)->None:
 
-    def download_audios(self, audio_list:List)->None:
+        local_path : str = local_audio_path(audio_file)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        await connector.download_file(audio_file.get("Filepath"), local_path)
 
+    async def _upload_audio_async(self, connector:object, audio_file:object, data:bytes=None)->None:
+
+        if data is None:
+            await connector.upload_file(audio_file.Filepath, audio_file.Filepath)
+        else:
+            await connector.upload_bytes(data, audio_file.Filepath)
+
+    async def _transfer_async(self, transfer, items:List[Tuple], desc:str)->List[Tuple]:
+        """
+        Run async transfers through the async variant of the connector,
+        keeping at most ASYNC_MAX_IN_FLIGHT of them in flight
+        :return: the items whose transfer failed
+        """
+
+        connector : object = get_async_connector(self._con, max_workers=self.download_workers)
+        slots = asyncio.Semaphore(self.async_max_in_flight)
+        failed : List[Tuple] = []
+
+        with tqdm(total=len(items), desc=desc) as pbar:
+
+            async def run(*args):
+                async with slots:
+                    try:
+                        await transfer(connector, *args)
+                    except Exception as e:
+                        print(f"Error {str(e)}")
+                        failed.append(args)
+                    pbar.update()
+
+            try:
+                await asyncio.gather(*(run(*item) for item in items))
+            finally:
+                await connector.close()
+
+        return failed
+
+    def _transfer_adaptive(self, transfer, items:List, size, desc:str)->List:
+        """
+        Run transfers with a concurrency adapted to throughput and throttling,
+        largest first, between TRANSFER_MIN_WORKERS and TRANSFER_MAX_WORKERS
+        :return: the items whose transfer failed
+        """
+
+        scheduler = AdaptiveTransferScheduler(min_workers=self.transfer_min_workers,
+                                              max_workers=self.transfer_max_workers)
+        failed : List = []
+
+        with tqdm(total=len(items), desc=desc) as pbar:
+            for item, error in scheduler.run(transfer, items, size):
+                if error:
+                    print(f"Error {str(error)}")
+                    failed.append(item)
+                pbar.update()
+                pbar.set_postfix(workers=scheduler.limit)
+
+        return failed
+
+    def download_audios(self, audio_list:List, audio_segments:Dict[int, List[Dict]]=None)->List[Dict]:
+        """
+        Download the source audios
+        :param audio_segments: segments by Audio_id, the end of the last segment is used
+                               as size estimate to start the longest audios first
+        :return: the audios that could not be downloaded
+        """
+
+        if self.async_transfers and not self.cache:
+            failed : List[Tuple] = asyncio.run(self._transfer_async(self._download_audio_async,
+                                                                    [(audio,) for audio in audio_list],
+                                                                    desc="Download audios"))
+            return [audio for audio, in failed]
+
+        if self.adaptive_transfers:
+            segments : Dict[int, List[Dict]] = audio_segments if audio_segments else {}
+            return self._transfer_adaptive(self._download_audio,
+                                           audio_list,
+                                           lambda audio: max((segm.get("End_time") for segm in segments.get(audio.get("id"), [])), default=0),
+                                           desc="Download audios")
+
+        failed_audios : List[Dict] = []
         with tqdm(total=len(audio_list), desc="Cut audios and upload them to blob") as pbar:
-                with ThreadPoolExecutor(max_workers=8) as executor:
-                    for error in executor.map(self._download_audio, audio_list):
+                with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+                    for audio, error in zip(audio_list, executor.map(partial(self._try_transfer, self._download_audio), audio_list)):
                             if error:
-                                print(error)
+                                print(f"Error {str(error)}")
+                                failed_audios.append(audio)
                             pbar.update()
 
-    def upload_audios(self, audio_list:List)->None:
+        return failed_audios
+
+    def upload_audios(self, audio_list:List, payloads:List[bytes]=None)->List[object]:
+        """
+        Upload the cutted audios, from disk or from their encoded payloads
+        :return: the cutted audios that could not be uploaded
+        """
+
+        uploads : List[Tuple] = list(zip(audio_list, payloads if payloads else repeat(None)))
+
+        if self.async_transfers:
+            failed : List[Tuple] = asyncio.run(self._transfer_async(self._upload_audio_async, uploads, desc="Upload audios"))
+            return [cutted for cutted, _ in failed]
 
+        if self.adaptive_transfers:
+            failed = self._transfer_adaptive(lambda upload: self._upload_audio(*upload),
+                                             uploads,
+                                             lambda upload: len(upload[1]) if upload[1] is not None else os.path.getsize(upload[0].Filepath),
+                                             desc="Upload audios")
+            return [cutted for cutted, _ in failed]
+
+        failed_audios : List[object] = []
         with tqdm(total=len(audio_list), desc="Cut audios and upload them to blob") as pbar:
-                with ThreadPoolExecutor(max_workers=8) as executor:
-                    for error in executor.map(self._upload_audio, audio_list):
+                with ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
+                    for (cutted, _), error in zip(uploads, executor.map(lambda upload: self._try_transfer(self._upload_audio, *upload), uploads)):
                             if error:
-                                print(error)
+                                print(f"Error {str(error)}")
+                                failed_audios.append(cutted)
                             pbar.update()
 
-    def _cut_audios(self, audio_files:List, audio_segments:List)->List[object]:
+        return failed_audios
 
-        cutted_audios : List= []
+    def _to_cutted_audios(self, records:List[Dict])->Tuple[List[object], List[bytes]]:
+        """
+        Build the Cutted_Audios rows from the engine records, splitting off
+        the encoded segments when cutting to buffers
+        """
 
-        for audio in audio_files:
-            time_series, sampling_rate = librosa.load(f"audios/{0}".format(audio.get("Audio_name")), sr=None, mono=False)
-            time_series = librosa.to_mono(time_series)
+        payloads : List[bytes] = [record.pop("Data", None) for record in records]
+        return [Cutted_Audios(**record) for record in records], payloads
 
-            segments = [f for f in audio_segments if f.get("Audio_id")==audio.get('id')]
-            for segm in segments:
+    def _cut_audios(self, audio_files:List, audio_segments:Dict[int, List[Dict]])->Tuple[List[object], List[bytes]]:
+        """
+        Cut every audio, sharding source audios across a process pool
+        when CUT_WORKERS > 1, and return the Cutted_Audios records with
+        their encoded segments (None when written to disk)
+        """
 
-                start_time = self._normalize_timestamp(segm.get("Start_time"), sampling_rate)
-                end_time = self._normalize_timestamp(segm.get("End_time"), sampling_rate)
+        cut_executor : Executor = ProcessPoolExecutor(max_workers=self.cut_workers) if self.cut_workers > 1 else ThreadPoolExecutor(max_workers=1)
 
-                try:
-                    slot = time_series[:,start_time:end_time]
-                except:
-                    slot = time_series[start_time:end_time]
+        with cut_executor as executor:
+            futures : Dict = {executor.submit(cut_audio, audio, audio_segments.get(audio.get('id'), []), self.cut_mode, self.cut_to_buffer, self.output): audio
+                              for audio in audio_files}
+            records : List[Dict] = self._collect_cuts(futures, desc="Cut audios")
 
-                slot = librosa.to_mono(slot)
+        return self._to_cutted_audios(records)
 
-                folder_name = segm.get('Audio_id')
-                os.makedirs(f"cutted_audios/{folder_name}", exist_ok=True)
-                output_file = f"cutted_audios/{folder_name}/{segm.get('Segment_number')}.wav"
-                sf.write(output_file, slot.T, sampling_rate)
+    def _collect_cuts(self, futures:Dict, desc:str)->List[Dict]:
+        """
+        Gather the records of the cut futures, an audio failing to cut is
+        logged and left out so the other audios of the chunk are still committed
+        """
 
-                cutted_audios.append(Cutted_Audios( Audio_id=segm.get('Audio_id'),
-                                                    Segment_id=segm.get("id"),
-                                                    Filepath=output_file,
-                                                    Start_time=segm.get("Start_time"),
-                                                    End_time=segm.get("End_time")))
-        return cutted_audios
+        records : List[Dict] = []
+        with tqdm(total=len(futures), desc=desc) as pbar:
+            for future in as_completed(futures):
+                try:
+                    records.extend(future.result())
+                except Exception as e:
+                    self.logger.error(f"Failed to cut audio {futures[future].get('Filepath')}: {e}")
+                pbar.update()
+
+        return records
+
+    def _cut_audio_ranged(self, audio:Dict, segments:List[Dict])->List[Dict]:
+        """
+        Cut an audio fetching only the byte ranges of its segments from storage,
+        sources that are not uncompressed WAV are downloaded and cut in streaming mode
+        """
+
+        read_range = partial(self._con.read_range, audio.get("Filepath"))
+        records : List[Dict] = cut_audio_ranged(audio, segments, read_range, self.cut_to_buffer, self.output)
+
+        if records is None:
+            self._download_audio(audio)
+            try:
+                records = cut_audio(audio, segments, "streaming", self.cut_to_buffer, self.output)
+            finally:
+                self._release_audio(audio)
+
+        return records
+
+    def _cut_audios_ranged(self, audio_files:List, audio_segments:Dict[int, List[Dict]])->Tuple[List[object], List[bytes]]:
+        """
+        Range-read cutting of every audio, I/O bound so it runs on the download workers
+        """
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            futures : Dict = {executor.submit(self._cut_audio_ranged, audio, audio_segments.get(audio.get('id'), [])): audio
+                              for audio in audio_files}
+            records : List[Dict] = self._collect_cuts(futures, desc="Cut audios from storage ranges")
+
+        return self._to_cutted_audios(records)
+
+    def _process_audio(self,
+                       audio:Dict,
+                       segments:List[Dict],
+                       downloads:ThreadPoolExecutor,
+                       cuts:Executor,
+                       uploads:ThreadPoolExecutor)->List[object]:
+        """
+        Move one audio through the download, cut and upload stages,
+        removing its local files as soon as each stage is done with them
+        """
+
+        if self.cut_mode == "range":
+            records : List[Dict] = downloads.submit(self._cut_audio_ranged, audio, segments).result()
+        else:
+            downloads.submit(self._download_audio, audio).result()
+            try:
+                records = cuts.submit(cut_audio, audio, segments, self.cut_mode, self.cut_to_buffer, self.output).result()
+            finally:
+                self._release_audio(audio)
+
+        cutted_audio, payloads = self._to_cutted_audios(records)
+        try:
+            list(uploads.map(self._upload_audio, cutted_audio, payloads))
+        finally:
+            for cutted in cutted_audio:
+                self._remove_local_file(cutted.Filepath)
+
+        return cutted_audio
+
+    def _run_cut_pipeline(self, audio_files:List, audio_segments:Dict[int, List[Dict]])->None:
+        """
+        Pipelined cutting: every audio flows through download, cut, upload
+        and DB commit independently. PIPELINE_IN_FLIGHT bounds how many
+        audios (and therefore local files) are in the pipeline at once.
+        """
+
+        segments : List[List[Dict]] = [audio_segments.get(audio.get('id'), []) for audio in audio_files]
+        cut_executor : Executor = ProcessPoolExecutor(max_workers=self.cut_workers) if self.cut_workers > 1 else ThreadPoolExecutor(max_workers=1)
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as downloads, \
+             cut_executor as cuts, \
+             ThreadPoolExecutor(max_workers=self.upload_workers) as uploads, \
+             ThreadPoolExecutor(max_workers=self.pipeline_in_flight) as drivers:
+
+            futures : Dict = {drivers.submit(self._process_audio, audio, segm, downloads, cuts, uploads): audio
+                              for audio, segm in zip(audio_files, segments)}
+
+            with tqdm(total=len(futures), desc="Cut audios and upload them to storage") as pbar:
+                for future in as_completed(futures):
+                    try:
+                        cutted_audio = future.result()
+                        if cutted_audio:
+                            self._add_data_to_database(cutted_audio)
+                    except Exception as e:
+                        self.logger.error(f"Failed to cut audio {futures[future].get('Filepath')}: {e}")
+                    pbar.update()
 
     def _add_data_to_database(self, cutted_audio:List[object]):
 
@@ -111,20 +403,48 @@ class Audio_Cutter:
         self._db.update_status(model= Audio_Segments,  id_list= [f.get("Segment_id") for f in audio_data], status_list=['Segment_Cutted']*len(audio_data))
 
     def run_cut_audios(self):
+        """
+        Cut the segmented audios chunk by chunk (COMMIT_BATCH_SIZE audios),
+        each chunk is cut and committed before the next one is read
+        """
 
-        data_to_cut : List[Dict[str]]  = self._get_data_to_cut()
-        audio_segments : List[Dict[str]]  = self._get_segments_audios()
+        audios_cut : int = 0
+        for data_to_cut in self._chunk_audios(self._get_data_to_cut()):
+            self._cut_chunk(data_to_cut, self._get_segments_audios([audio.get("id") for audio in data_to_cut]))
+            audios_cut += len(data_to_cut)
 
-        if data_to_cut:
+        if not audios_cut:
+            self.logger.info("No more audios to cut")
 
-            self.download_audios(data_to_cut)
-            cutted_audio = self._cut_audios(data_to_cut, audio_segments)
+    def _cut_chunk(self, data_to_cut:List[Dict], audio_segments:Dict[int, List[Dict]])->None:
+        """
+        Download, cut, upload and commit one chunk of audios
+        """
 
-            self.upload_audios(cutted_audio)
-            self._add_data_to_database(cutted_audio)
+        if self.pipeline:
+
+            self._run_cut_pipeline(data_to_cut, audio_segments)
 
         else:
-             self.logger.info("No more audios to cut")
+
+            if self.cut_mode == "range":
+                cutted_audio, payloads = self._cut_audios_ranged(data_to_cut, audio_segments)
+            else:
+                not_downloaded : Set[int] = {audio.get("id") for audio in self.download_audios(data_to_cut, audio_segments)}
+                downloaded : List[Dict] = [audio for audio in data_to_cut if audio.get("id") not in not_downloaded]
+                try:
+                    cutted_audio, payloads = self._cut_audios(downloaded, audio_segments)
+                finally:
+                    if self.cache:
+                        for audio in downloaded:
+                            self._release_audio(audio)
+
+            # an audio is committed only when all its segments are uploaded,
+            # otherwise it stays Segmented and is cut again on the next run
+            not_uploaded : Set[int] = {cutted.Audio_id for cutted in self.upload_audios(cutted_audio, payloads)}
+            uploaded : List[object] = [cutted for cutted in cutted_audio if cutted.Audio_id not in not_uploaded]
+            if uploaded:
+                self._add_data_to_database(uploaded)
 
 
 
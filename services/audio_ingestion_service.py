@@ -1,70 +1,120 @@
-from models.models import AudioCollection
-from typing import List
+from models.models import AudioCollection, Ingestion_Cursor
+from typing import List, Set, Iterable
+from itertools import islice
+from datetime import datetime
 from sql.database import Database
+from environments.environments import Environments
 
 
 class Audio_Ingestion:
 
     _service_name = "audio_ingestion"
 
-    def __init__(self, database:Database, connector: object, logger:object):
+    def __init__(self, database:Database, connector: object, logger:object, chunk_size:int = 5000):
 
         self._db = database
         self._con = connector
         self.logger = logger
         self.extensions = (".mp3",".wav")
+        self.chunk_size = chunk_size
+        self.parallel_listing = Environments.get_parallel_listing()
+        self.listing_workers = Environments.get_listing_workers()
 
-    def _get_all_data_ingested(self):
+    def _get_data_ingested(self, files:List)->Set:
         """
-        Return all files ingested in DB
+        Return the files of the list already ingested in DB,
+        looked up through the Filepath unique index
         """
-        audio_ingested : List =[f.Audio_path for f in self._db.get_all_from_model(model= AudioCollection)]
-        return audio_ingested
+        return self._db.get_existing_values(model=AudioCollection, column="Filepath", values=files)
 
     def _get_files_in_storage(self, folder:str=None, container:str=None):
         """
-        Returns all files in storage
+        Returns all files in storage as they are listed, date folders are
+        listed concurrently when PARALLEL_LISTING is enabled
         """
-        return self._con.get_list_files(container=container, folder=folder)
+        return self._con.iter_list_files(folder=folder,
+                                         container=container,
+                                         parallel=self.parallel_listing,
+                                         max_workers=self.listing_workers)
 
-    def _remove_files_ingested(self, ingested_files:List, total_files:List)->List:
+    def _get_new_files_in_storage(self, folder:str=None, container:str=None):
         """
-        Returns List of files not ingested
+        Returns only the files added since the cursor stored by the previous
+        incremental run, together with the cursor to store after this one
         """
-        new_files :List = [f for f in total_files if f not in ingested_files]
-        return new_files
+        cursor : object = self._get_cursor(folder)
+        return self._con.list_new_files(folder=folder,
+                                        cursor=cursor.Cursor if cursor else None,
+                                        container=container)
 
-    def _add_data_to_database(self, new_ingestion:List[object]):
-
-        audio_data =[audio.__dict__ for audio in new_ingestion]
-        self._db.add_data_to_db(model=AudioCollection, data=audio_data)
+    def _get_cursor(self, folder:str=None)->object:
 
-    def run_ingestion(self, folder:str=None, container:str=None):
+        return self._db.get_first_from_model(model=Ingestion_Cursor,
+                                             Connector=self._con.__connector_name__,
+                                             Datasource=folder if folder else "")
 
-        files_ingested : List = self._get_all_data_ingested()
-        files_in_storage : List = [f for f in self._get_files_in_storage(folder=folder, container=container) if f.endswith(self.extensions)]
-        new_files : List = self._remove_files_ingested(ingested_files=files_ingested, total_files=files_in_storage)
+    def _save_cursor(self, cursor:str, folder:str=None)->None:
 
-        if new_files:
-            new_ingestion = []
-            for new_audio in new_files:
-                new_ingestion.append(AudioCollection(Filepath=new_audio))
-
-            self._add_data_to_database(new_ingestion)
+        stored_cursor : object = self._get_cursor(folder)
 
+        if stored_cursor:
+            self._db.update_row(model=Ingestion_Cursor, row_id=stored_cursor.id, values={"Cursor": cursor,
+                                                                                        "Date": datetime.utcnow().isoformat()})
         else:
-            print("No Data To Ingest")
-
-
-
+            new_cursor = Ingestion_Cursor(Connector=self._con.__connector_name__,
+                                          Datasource=folder if folder else "",
+                                          Cursor=cursor)
+            self._db.add_data_to_db(model=Ingestion_Cursor, data=[new_cursor.__dict__])
 
+    def _chunk_files(self, files:Iterable)->Iterable[List]:
+        """
+        Split the storage listing in chunks of chunk_size audio files
+        """
+        audio_files = (f for f in files if f.endswith(self.extensions))
+        while True:
+            chunk : List = list(islice(audio_files, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _remove_files_ingested(self, ingested_files:Set, total_files:List)->List:
+        """
+        Returns List of files not ingested
+        """
+        new_files :List = [f for f in total_files if f not in ingested_files]
+        return new_files
 
+    def _add_data_to_database(self, new_ingestion:List[object]):
 
+        audio_data =[audio.__dict__ for audio in new_ingestion]
+        self._db.add_data_to_db(model=AudioCollection, data=audio_data)
 
+    def run_ingestion(self, folder:str=None, container:str=None, incremental:bool=False):
+        """
+        Ingest the audios in storage not yet mapped in DB
+        :param folder: folder (prefix) with audios in storage
+        :param container: container/bucket, connector default if None
+        :param incremental: only list objects newer than the cursor of the previous run
+        """
 
+        total_ingested : int = 0
 
+        if incremental:
+            files, cursor = self._get_new_files_in_storage(folder=folder, container=container)
+        else:
+            files = self._get_files_in_storage(folder=folder, container=container)
 
+        for files_in_storage in self._chunk_files(files):
 
+            files_ingested : Set = self._get_data_ingested(files_in_storage)
+            new_files : List = self._remove_files_ingested(ingested_files=files_ingested, total_files=files_in_storage)
 
+            if new_files:
+                self._add_data_to_database([AudioCollection(Filepath=new_audio) for new_audio in new_files])
+                total_ingested += len(new_files)
 
+        if incremental and cursor:
+            self._save_cursor(cursor, folder)
 
+        if not total_ingested:
+            print("No Data To Ingest")
@@ -1,6 +1,10 @@
 from models.models import Audio_Segments, AudioCollection
 from services.api_comsumer_service import Api_Consumer
-from typing import List, Dict
+from environments.environments import Environments
+from services.vad_engine import segment_audio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Dict, Iterator, Tuple
 import os
 
 class Audio_Segment(Api_Consumer):
@@ -16,15 +20,18 @@ class Audio_Segment(Api_Consumer):
         self._db = database
         self._con = connector
         self.logger = logger
+        self.max_in_flight = Environments.get_segmentation_in_flight()
+        self.batch_size = Environments.get_commit_batch_size()
+        self.backend = Environments.get_segmentation_backend()
+        self.segmentation_workers = Environments.get_segmentation_workers()
+        self.download_workers = Environments.get_download_workers()
+        self.vad_parameters = Environments.get_vad_parameters()
 
-    def _get_audios_to_segment(self)->List[Dict] :
+    def _get_audios_to_segment(self)->Iterator[Dict] :
 
-        audio_to_segment :List[Dict[str]] =[{
-                               "Audio_id": f.id,
-                               "Audio_name":f.Audio_name,
-                               "Filepath": f.Filepath} for f in self._db.get_all_from_model_with_status(model = AudioCollection, status=['Ingested'])]
-
-        return audio_to_segment
+        return ({"Audio_id": f.id,
+                 "Audio_name":f.Audio_name,
+                 "Filepath": f.Filepath} for f in self._db.iter_from_model_with_status(model = AudioCollection, status=['Ingested'], columns=["Audio_name", "Filepath"]))
 
     def _add_data_to_database(self, audio_segmented:List[object]):
 
@@ -32,27 +39,77 @@ class Audio_Segment(Api_Consumer):
         self._db.add_data_to_db(model=Audio_Segments, data=audio_data)
         self._db.update_status(model= AudioCollection, id_list= [f.get("Audio_id") for f in audio_data], status_list=['Segmented']*len(audio_data))
 
-    def run_segmentation(self):
+    def _segment(self, audio:Dict)->List[object]:
 
-        audios_to_segment :List[Dict[str]] = self._get_audios_to_segment()
+        sas_link : str = self._con.get_public_link(audio.get("Filepath"))
+        results = self.get_audio_segments(sas_link, audio_id=audio.get("Audio_id"))
+        return [Audio_Segments(**result) for result in results]
 
-        if audios_to_segment:
+    def _segment_local(self, audio:Dict, vad:ProcessPoolExecutor)->List[object]:
+        """
+        Download one source audio and run the local VAD on it in the process pool
+        """
 
-            audio_segmented :List = []
-            for audio in audios_to_segment:
+        local_path : str = os.path.join("audios", str(audio.get("Audio_id")), audio.get("Audio_name"))
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        self._con.download_file(audio.get("Filepath"), local_path)
 
-                try:
-                    sas_link : str = self._con.get_public_link(audio.get("Filepath"))
-                    results = self.get_audio_segments(sas_link, audio_id=audio.get("Audio_id"))
-                    for result in results:
-                        audio_segmented.append(Audio_Segments(**result))
+        try:
+            results = vad.submit(segment_audio, local_path, audio.get("Audio_id"), self.vad_parameters).result()
+            return [Audio_Segments(**result) for result in results]
+        finally:
+            self._remove_local_file(local_path)
 
-                except Exception as e:
-                    print(f"Error {str(e)}")
+    def _remove_local_file(self, filepath:str)->None:
 
-            if audio_segmented:
-                self._add_data_to_database(audio_segmented=audio_segmented)
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+
+    def _dispatch_local(self, audios:Iterator[Dict])->Iterator[Tuple[Dict, List[object], Exception]]:
+        """
+        Local segmentation of many audios, up to DOWNLOAD_WORKERS audios are
+        downloaded at once and the VAD runs on SEGMENTATION_WORKERS processes,
+        yielding like dispatch
+        """
+
+        with ProcessPoolExecutor(max_workers=self.segmentation_workers) as vad:
+            yield from self.dispatch(partial(self._segment_local, vad=vad), audios, self.download_workers)
+
+    def run_segmentation(self):
+        """
+        Segment the ingested audios with up to SEGMENTATION_IN_FLIGHT concurrent
+        link generations and requests, or with the local VAD when
+        SEGMENTATION_BACKEND is local, writing segments every COMMIT_BATCH_SIZE
+        audios so partial progress survives a crash
+        """
+
+        audios_to_segment :Iterator[Dict] = self._get_audios_to_segment()
 
+        if self.backend == "local":
+            results = self._dispatch_local(audios_to_segment)
         else:
-            self.logger.info("No new audio to segment")
+            results = self.dispatch(self._segment, audios_to_segment, self.max_in_flight)
+
+        audio_segmented :List = []
+        audios_seen : int = 0
+        audios_done : int = 0
+        for audio, segments, error in results:
 
+            audios_seen += 1
+            if error:
+                print(f"Error {str(error)}")
+                continue
+
+            audio_segmented.extend(segments)
+            audios_done += 1
+            if audios_done % self.batch_size == 0 and audio_segmented:
+                self._add_data_to_database(audio_segmented=audio_segmented)
+                audio_segmented = []
+
+        if audio_segmented:
+            self._add_data_to_database(audio_segmented=audio_segmented)
+
+        if not audios_seen:
+            self.logger.info("No new audio to segment")
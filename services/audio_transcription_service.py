@@ -1,6 +1,7 @@
 from models.models import Audios_Transcriptions, Cutted_Audios
 from services.api_comsumer_service import Api_Consumer
-from typing import Dict, List
+from environments.environments import Environments
+from typing import Dict, List, Iterable, Iterator
 
 class Audio_Transcrioption(Api_Consumer):
 
@@ -15,48 +16,93 @@ class Audio_Transcrioption(Api_Consumer):
         self._db = database
         self._con = connector
         self.logger = logger
+        self.max_in_flight = Environments.get_transcription_in_flight()
+        self.batch_size = Environments.get_commit_batch_size()
+        self.request_batch_size = Environments.get_transcription_batch_size()
+        self.request_batch_duration = Environments.get_transcription_batch_duration()
 
 
-    def _get_audios_to_transcribe(self)->List[Dict]:
+    def _get_audios_to_transcribe(self)->Iterator[Dict]:
 
-        audio_to_transcribe : List[Dict[str]] = [{"id":f.id,
-                                       "Filepath": f.Filepath}
-                                      for f in self._db.get_all_from_model_with_status(model = Cutted_Audios, status=['Ready_To_Transcribe'])]
-
-        return audio_to_transcribe
+        return ({"id":f.id,
+                 "Filepath": f.Filepath,
+                 "Duration": f.End_time - f.Start_time}
+                for f in self._db.iter_from_model_with_status(model = Cutted_Audios, status=['Ready_To_Transcribe'], columns=["Filepath", "Start_time", "End_time"]))
 
     def _add_data_to_database(self, audio_trancribed:List[object]):
 
         audio_data =[audio.__dict__ for audio in audio_trancribed]
         self._db.add_data_to_db(model=Audios_Transcriptions, data=audio_data)
-        self._db.update_status(model= Cutted_Audios, id_list= [f.get("id") for f in audio_data], status_list=['Transcribed']*len(audio_data))
+        self._db.update_status(model= Cutted_Audios, id_list= [f.get("Audio_id") for f in audio_data], status_list=['Transcribed']*len(audio_data))
 
-    def run_transcription(self):
+    def _transcribe(self, audio:Dict)->object:
 
-        audios_to_transcribe :Dict[str, Dict[str, str]] = self._get_audios_to_transcribe()
+        result : Dict = self.transcribe_audio(self._con.get_public_link(audio.get("Filepath")), audio_id=audio.get("id"))
+        return Audios_Transcriptions(**result)
 
-        if audios_to_transcribe:
+    def _transcribe_batch(self, audios:List[Dict])->List[object]:
+        """
+        Transcribe a batch of cutted audios in one request and map the
+        returned transcriptions back to their Cutted_Audios ids
+        """
 
-            audio_trancribed :List = []
-            for audio in audios_to_transcribe:
+        requested : set = {audio.get("id") for audio in audios}
+        links : Dict[str, str] = self._con.get_public_links([audio.get("Filepath") for audio in audios])
+        results : List[Dict] = self.transcribe_audios([{"audio_url": links[audio.get("Filepath")],
+                                                         "audio_id": audio.get("id")} for audio in audios])
 
-                try:
-                    result : Dict = self.transcribe_audio(self._con.get_public_link(audio.get("Filepath")), audio_id=audio.get("id"))
-                    audio_trancribed.extend(Audios_Transcriptions(**result))
+        return [Audios_Transcriptions(**result) for result in results if result.get("audio_id") in requested]
 
-                except Exception as e:
-                    print(f"Error {str(e)}")
+    def _batch_audios(self, audios:Iterable[Dict])->Iterator[List[Dict]]:
+        """
+        Group cutted audios in batches of at most TRANSCRIPTION_BATCH_SIZE audios
+        and TRANSCRIPTION_BATCH_DURATION seconds of audio
+        """
 
-            if audio_trancribed:
-                self._add_data_to_database(audio_trancribed=audio_trancribed)
+        batch : List[Dict] = []
+        duration : float = 0
 
-        else:
-            self.logger.info("No new audio to ingest")
+        for audio in audios:
+            if batch and (len(batch) >= self.request_batch_size or duration + audio.get("Duration") > self.request_batch_duration):
+                yield batch
+                batch, duration = [], 0
 
+            batch.append(audio)
+            duration += audio.get("Duration")
 
+        if batch:
+            yield batch
 
+    def run_transcription(self):
+        """
+        Transcribe the cutted audios with up to TRANSCRIPTION_IN_FLIGHT concurrent
+        requests, committing results every COMMIT_BATCH_SIZE transcriptions.
+        With TRANSCRIPTION_BATCH_SIZE > 1 each request carries a batch of audios
+        """
 
+        audios_to_transcribe :Iterator[Dict] = self._get_audios_to_transcribe()
 
+        if self.request_batch_size > 1:
+            responses = self.dispatch(self._transcribe_batch, self._batch_audios(audios_to_transcribe), self.max_in_flight)
+        else:
+            responses = self.dispatch(lambda audio: [self._transcribe(audio)], audios_to_transcribe, self.max_in_flight)
+
+        audio_trancribed :List = []
+        requests_seen : int = 0
+        for audios, transcriptions, error in responses:
 
+            requests_seen += 1
+            if error:
+                print(f"Error {str(error)}")
+                continue
 
+            audio_trancribed.extend(transcriptions)
+            if len(audio_trancribed) >= self.batch_size:
+                self._add_data_to_database(audio_trancribed=audio_trancribed)
+                audio_trancribed = []
 
+        if audio_trancribed:
+            self._add_data_to_database(audio_trancribed=audio_trancribed)
+
+        if not requests_seen:
+            self.logger.info("No new audio to ingest")
@@ -0,0 +1,279 @@
+"""
+Module level cutting functions, kept free of service state (database,
+connector, logger) so they can be shipped to worker processes.
+Every cut function returns plain dicts with the Cutted_Audios fields,
+plus the encoded WAV bytes under "Data" when cutting to buffers.
+"""
+import os
+import io
+import struct
+from typing import List, Dict, Callable, Optional, Tuple
+import numpy as np
+import librosa
+import soundfile as sf
+import soxr
+
+def local_audio_path(audio:Dict)->str:
+    """
+    Local copy of the source audio, Local_path is set when it comes from the cache
+    """
+    if audio.get("Local_path"):
+        return audio.get("Local_path")
+
+    return os.path.join("audios", str(audio.get("id")), audio.get("Audio_name"))
+
+def normalize_timestamp(timestamp: float, sampling_rate: int) -> int:
+    return int(timestamp * sampling_rate)
+
+OUTPUT_FORMATS : Dict = {"WAV": {"extension": ".wav", "format": "WAV", "subtype": "PCM_16"},
+                         "FLAC": {"extension": ".flac", "format": "FLAC", "subtype": "PCM_16"},
+                         "OPUS": {"extension": ".opus", "format": "OGG", "subtype": "OPUS"}}
+
+OPUS_SAMPLE_RATES : Tuple = (8000, 12000, 16000, 24000, 48000)
+
+def output_settings(samplerate:int=16000, output_format:str="WAV")->Dict:
+    """
+    Normalization settings of the cut segments, picklable so they can go to worker processes
+    :param samplerate: sampling rate of the segments (Opus supports 8/12/16/24/48 kHz)
+    :param output_format: WAV/FLAC (16-bit PCM) or OPUS (Ogg)
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Output format {output_format} not available")
+
+    if output_format == "OPUS" and samplerate not in OPUS_SAMPLE_RATES:
+        raise ValueError(f"Sample rate {samplerate} not supported by Opus, use one of {OPUS_SAMPLE_RATES}")
+
+    return {"samplerate": samplerate, **OUTPUT_FORMATS[output_format]}
+
+def normalize_segment(slot, sampling_rate:int, output:Dict):
+    """
+    Resample a mono segment to the output sampling rate with soxr,
+    clipped so the 16-bit encoding does not wrap around
+    """
+    if sampling_rate != output["samplerate"] and len(slot):
+        slot = soxr.resample(slot, sampling_rate, output["samplerate"])
+
+    return np.clip(slot, -1.0, 1.0)
+
+def write_segment(segm:Dict, slot, sampling_rate:int, to_buffer:bool=False, output:Dict=None)->Dict:
+    """
+    Write one mono segment to disk, or encode it in memory when to_buffer,
+    and return its Cutted_Audios record
+    :param output: output_settings to resample and encode the segment, None keeps
+                   the source sampling rate in a 16-bit PCM WAV
+    """
+
+    folder_name = segm.get('Audio_id')
+    extension : str = output["extension"] if output else ".wav"
+    output_file = f"cutted_audios/{folder_name}/{segm.get('Segment_number')}{extension}"
+
+    encoding : Dict = {"format": "WAV"}
+    if output:
+        slot = normalize_segment(slot, sampling_rate, output)
+        sampling_rate = output["samplerate"]
+        encoding = {"format": output["format"], "subtype": output["subtype"]}
+
+    record : Dict = {"Audio_id": segm.get('Audio_id'),
+                     "Segment_id": segm.get("id"),
+                     "Filepath": output_file,
+                     "Start_time": segm.get("Start_time"),
+                     "End_time": segm.get("End_time")}
+
+    if to_buffer:
+        buffer = io.BytesIO()
+        sf.write(buffer, slot.T, sampling_rate, **encoding)
+        record["Data"] = buffer.getvalue()
+    else:
+        # written aside and replaced, so a previous segment linked into storage is never rewritten
+        os.makedirs(f"cutted_audios/{folder_name}", exist_ok=True)
+        sf.write(output_file + ".part", slot.T, sampling_rate, **encoding)
+        os.replace(output_file + ".part", output_file)
+
+    return record
+
+def segment_frames(segments:List[Dict], sampling_rate:int, total_frames:int)->np.ndarray:
+    """
+    Start and end frames of every segment, clipped to the recording
+    :return: (n_segments, 2) int64 array
+    """
+    if not segments:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    times : np.ndarray = np.array([(segm.get("Start_time"), segm.get("End_time")) for segm in segments], dtype=np.float64)
+    frames : np.ndarray = np.clip((times * sampling_rate).astype(np.int64), 0, total_frames)
+    frames[:, 1] = np.maximum(frames[:, 1], frames[:, 0])
+    return frames
+
+def cut_audio_in_memory(audio:Dict, segments:List[Dict], to_buffer:bool=False, output:Dict=None)->List[Dict]:
+    """
+    Decode and downmix the whole source file once, then write every
+    segment from a view of that array (no per segment copy or downmix)
+    """
+
+    time_series, sampling_rate = librosa.load(local_audio_path(audio), sr=None, mono=True)
+    frames : np.ndarray = segment_frames(segments, sampling_rate, len(time_series))
+
+    return [write_segment(segm, time_series[start:end], sampling_rate, to_buffer, output)
+            for segm, (start, end) in zip(segments, frames)]
+
+def cut_audio_streaming(audio:Dict, segments:List[Dict], to_buffer:bool=False, output:Dict=None)->List[Dict]:
+    """
+    Seek to every segment and read only its frames from the source file,
+    so memory is bounded by the longest segment instead of the recording
+    """
+
+    audio_path : str = local_audio_path(audio)
+
+    try:
+        source = sf.SoundFile(audio_path)
+    except RuntimeError:
+        return cut_audio_decoded(audio, segments, to_buffer, output)
+
+    if not source.seekable():
+        source.close()
+        return cut_audio_decoded(audio, segments, to_buffer, output)
+
+    cutted_audios : List = []
+    with source:
+        sampling_rate : int = source.samplerate
+        frames : np.ndarray = segment_frames(segments, sampling_rate, source.frames)
+
+        for segm, (start_time, end_time) in zip(segments, frames):
+
+            source.seek(int(start_time))
+            slot = source.read(frames=int(end_time - start_time), dtype="float32", always_2d=True)
+            cutted_audios.append(write_segment(segm, slot.mean(axis=1), sampling_rate, to_buffer, output))
+
+    return cutted_audios
+
+def cut_audio_decoded(audio:Dict, segments:List[Dict], to_buffer:bool=False, output:Dict=None)->List[Dict]:
+    """
+    Decode path for formats soundfile cannot seek in (e.g. MP3),
+    decoding only the window of each segment
+    """
+
+    audio_path : str = local_audio_path(audio)
+    cutted_audios : List = []
+
+    for segm in segments:
+        start_time : float = segm.get("Start_time")
+        duration : float = max(segm.get("End_time") - start_time, 0)
+
+        slot, sampling_rate = librosa.load(audio_path, sr=None, mono=True, offset=start_time, duration=duration)
+        cutted_audios.append(write_segment(segm, slot, sampling_rate, to_buffer, output))
+
+    return cutted_audios
+
+WAV_HEADER_BYTES : int = 64 * 1024
+
+WAV_SUBTYPES : Dict = {(1, 8): "PCM_U8",
+                       (1, 16): "PCM_16",
+                       (1, 24): "PCM_24",
+                       (1, 32): "PCM_32",
+                       (3, 32): "FLOAT",
+                       (3, 64): "DOUBLE"}
+
+def parse_wav_header(header:bytes)->Optional[Dict]:
+    """
+    Parse the RIFF header of an uncompressed WAV file
+    :param header: first bytes of the file, must include the start of the data chunk
+    :return: channels, samplerate, subtype, block_align, data_offset and data_size,
+             None if the file is not an uncompressed WAV
+    """
+
+    if len(header) < 12 or header[0:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+
+    wav_format : Dict = {}
+    position : int = 12
+
+    while position + 8 <= len(header):
+        chunk_id, chunk_size = struct.unpack("<4sI", header[position:position + 8])
+        body : int = position + 8
+
+        if chunk_id == b"fmt ":
+            format_tag, channels, samplerate, _, block_align, bits = struct.unpack("<HHIIHH", header[body:body + 16])
+            if format_tag == 0xFFFE and chunk_size >= 40:
+                format_tag = struct.unpack("<H", header[body + 24:body + 26])[0]
+
+            subtype : str = WAV_SUBTYPES.get((format_tag, bits))
+            if subtype is None:
+                return None
+
+            wav_format = {"channels": channels,
+                          "samplerate": samplerate,
+                          "subtype": subtype,
+                          "block_align": block_align}
+
+        elif chunk_id == b"data":
+            if not wav_format:
+                return None
+            wav_format["data_offset"] = body
+            wav_format["data_size"] = chunk_size
+            return wav_format
+
+        position = body + chunk_size + (chunk_size & 1)
+
+    return None
+
+def cut_audio_ranged(audio:Dict,
+                     segments:List[Dict],
+                     read_range:Callable[[int, int], bytes],
+                     to_buffer:bool=False,
+                     output:Dict=None)->Optional[List[Dict]]:
+    """
+    Cut an uncompressed WAV straight from storage, computing the byte range
+    of every segment from the header and fetching only those ranges
+    :param read_range: function (offset, length) -> bytes of the source file
+    :return: Cutted_Audios records, None if the source is not an uncompressed WAV
+    """
+
+    header : Dict = parse_wav_header(read_range(0, WAV_HEADER_BYTES))
+    if header is None:
+        return None
+
+    sampling_rate : int = header["samplerate"]
+    block_align : int = header["block_align"]
+    total_frames : int = header["data_size"] // block_align
+
+    cutted_audios : List = []
+    for segm in segments:
+
+        start_time = min(normalize_timestamp(segm.get("Start_time"), sampling_rate), total_frames)
+        end_time = min(normalize_timestamp(segm.get("End_time"), sampling_rate), total_frames)
+        frames : int = max(end_time - start_time, 0)
+
+        if frames:
+            data : bytes = read_range(header["data_offset"] + start_time * block_align, frames * block_align)
+            slot, _ = sf.read(io.BytesIO(data),
+                              format="RAW",
+                              subtype=header["subtype"],
+                              samplerate=sampling_rate,
+                              channels=header["channels"],
+                              endian="LITTLE",
+                              dtype="float32",
+                              always_2d=True)
+        else:
+            slot = np.zeros((0, header["channels"]), dtype="float32")
+
+        cutted_audios.append(write_segment(segm, slot.mean(axis=1), sampling_rate, to_buffer, output))
+
+    return cutted_audios
+
+CUT_MODES : Dict = {"memory": cut_audio_in_memory,
+                    "streaming": cut_audio_streaming}
+
+def cut_audio(audio:Dict, segments:List[Dict], cut_mode:str="memory", to_buffer:bool=False, output:Dict=None)->List[Dict]:
+    """
+    Cut all segments of one source audio with the selected mode
+    :param audio: audio_collection row as dict (id, Audio_name, Filepath)
+    :param segments: Audio_Segments rows of that audio as dicts
+    :param cut_mode: memory/streaming
+    :param to_buffer: keep the encoded segments in memory instead of writing WAV files
+    :param output: output_settings to resample and encode the segments
+    :return: List of Cutted_Audios records as dicts
+    """
+    if cut_mode not in CUT_MODES:
+        raise ValueError(f"Cut mode {cut_mode} not available")
+
+    return CUT_MODES[cut_mode](audio, segments, to_buffer, output)
@@ -0,0 +1,194 @@
+"""
+Local voice activity detection, an alternative to the pyannote API.
+Like the cutting engine, functions are module level and free of service
+state so they can run in worker processes, and they return plain dicts
+with the Audio_Segments fields.
+"""
+from typing import List, Dict, Tuple, Iterable, Iterator
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import librosa
+import soundfile as sf
+import soxr
+
+VAD_SAMPLE_RATE : int = 16000
+FRAME_LENGTH : int = 512
+HOP_LENGTH : int = 160
+BLOCK_SECONDS : int = 30
+
+WINDOW : np.ndarray = np.hanning(FRAME_LENGTH + 1)[:-1]
+
+def smooth(values:np.ndarray, width:int)->np.ndarray:
+    """
+    Moving average over width frames
+    """
+    if width <= 1 or len(values) == 0:
+        return values
+
+    return np.convolve(values, np.ones(width) / width, mode="same")
+
+def iter_blocks(audio_path:str)->Iterator[np.ndarray]:
+    """
+    Mono blocks of BLOCK_SECONDS at VAD_SAMPLE_RATE, read and resampled in
+    streaming so memory does not grow with the recording length. Files soundfile
+    cannot open are decoded whole by librosa as a single block
+    """
+
+    try:
+        source = sf.SoundFile(audio_path)
+    except RuntimeError:
+        yield librosa.load(audio_path, sr=VAD_SAMPLE_RATE, mono=True)[0]
+        return
+
+    with source:
+        resampler = soxr.ResampleStream(source.samplerate, VAD_SAMPLE_RATE, 1, dtype="float32") if source.samplerate != VAD_SAMPLE_RATE else None
+
+        for block in source.blocks(blocksize=source.samplerate * BLOCK_SECONDS, dtype="float32", always_2d=True):
+            mono : np.ndarray = block.mean(axis=1)
+            yield resampler.resample_chunk(mono) if resampler else mono
+
+        if resampler:
+            yield resampler.resample_chunk(np.zeros(0, dtype="float32"), last=True)
+
+def frame_features(blocks:Iterable[np.ndarray])->Tuple[np.ndarray, np.ndarray]:
+    """
+    RMS energy and spectral flux of every HOP_LENGTH frame, computed block by block.
+    The samples of the frame overlapping a block boundary and the spectrum of the
+    previous frame are carried to the next block, so results do not depend on the block size
+    :return: rms and flux arrays, one value per frame
+    """
+
+    carry : np.ndarray = np.zeros(0, dtype="float32")
+    previous : np.ndarray = None
+    rms : List[np.ndarray] = []
+    flux : List[np.ndarray] = []
+
+    for block in blocks:
+        buffer : np.ndarray = np.concatenate((carry, block))
+        if len(buffer) < FRAME_LENGTH:
+            carry = buffer
+            continue
+
+        frames : np.ndarray = sliding_window_view(buffer, FRAME_LENGTH)[::HOP_LENGTH]
+        carry = buffer[len(frames) * HOP_LENGTH:]
+
+        spectrum : np.ndarray = np.abs(np.fft.rfft(frames * WINDOW, axis=1))
+        reference : np.ndarray = previous if previous is not None else spectrum[0]
+        increase : np.ndarray = np.clip(np.diff(np.vstack((reference[None], spectrum)), axis=0), 0, None)
+
+        rms.append(np.sqrt(np.mean(frames ** 2, axis=1)))
+        flux.append(np.sqrt(np.sum(increase ** 2, axis=1)))
+        previous = spectrum[-1]
+
+    if not rms:
+        return np.zeros(0), np.zeros(0)
+
+    return np.concatenate(rms), np.concatenate(flux)
+
+def hysteresis(strong:np.ndarray, weak:np.ndarray)->np.ndarray:
+    """
+    Keep the runs of weak frames that contain at least one strong frame, so a
+    region starts on the high threshold and only ends below the low one
+    """
+
+    weak = weak | strong
+    edges : np.ndarray = np.diff(np.concatenate(([0], weak.astype(np.int8), [0])))
+    starts : np.ndarray = np.flatnonzero(edges == 1)
+    ends : np.ndarray = np.flatnonzero(edges == -1)
+
+    strong_count : np.ndarray = np.concatenate(([0], np.cumsum(strong)))
+    kept : np.ndarray = strong_count[ends] > strong_count[starts]
+
+    marks : np.ndarray = np.zeros(len(weak) + 1, dtype=np.int64)
+    np.add.at(marks, starts[kept], 1)
+    np.add.at(marks, ends[kept], -1)
+
+    return np.cumsum(marks)[:-1] > 0
+
+def speech_frames(rms:np.ndarray,
+                  flux:np.ndarray,
+                  energy_margin:float=12.0,
+                  flux_ratio:float=2.0,
+                  smoothing:int=30,
+                  energy_hysteresis:float=6.0,
+                  median_width:int=31)->np.ndarray:
+    """
+    Frame level speech mask from energy and spectral flux. A frame is speech when
+    its energy is energy_margin dB above the noise floor and its smoothed spectral flux
+    is flux_ratio times the flux of the noise frames, which rejects loud stationary noise.
+    Speech goes on above energy_margin and off below energy_margin - energy_hysteresis,
+    then a median filter removes the flicker left by the dips between syllables
+    :param rms: RMS energy per frame
+    :param flux: spectral flux per frame
+    :param energy_margin: dB above the noise floor (10th percentile of frame energy)
+    :param flux_ratio: smoothed flux relative to the median flux of noise frames
+    :param smoothing: frames of the flux moving average (10 ms per frame)
+    :param energy_hysteresis: dB below energy_margin before speech goes off
+    :param median_width: frames of the median filter applied to the mask, odd
+    :return: boolean array, one value per HOP_LENGTH frame
+    """
+
+    energy : np.ndarray = 20 * np.log10(rms + 1e-10)
+    floor : float = np.percentile(energy, 10)
+    loud : np.ndarray = energy > floor + energy_margin
+
+    flux = smooth(flux, smoothing)
+    noise_flux : float = np.median(flux[~loud]) if (~loud).any() else np.percentile(flux, 10)
+    changing : np.ndarray = flux > noise_flux * flux_ratio
+
+    mask : np.ndarray = hysteresis(loud & changing, (energy > floor + energy_margin - energy_hysteresis) & changing)
+
+    # a median over a boolean mask is a majority vote
+    return smooth(mask.astype(np.float64), median_width) > 0.5
+
+def frames_to_regions(mask:np.ndarray,
+                      frame_duration:float,
+                      min_duration_on:float=0.0,
+                      min_duration_off:float=0.0)->List[Tuple[float, float]]:
+    """
+    Turn a frame mask into (start, end) regions in seconds, filling gaps shorter
+    than min_duration_off and then dropping regions shorter than min_duration_on,
+    as pyannote does with its hyper parameters
+    """
+
+    edges : np.ndarray = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts : np.ndarray = np.flatnonzero(edges == 1) * frame_duration
+    ends : np.ndarray = np.flatnonzero(edges == -1) * frame_duration
+
+    regions : List[List[float]] = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_duration_off:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    return [(float(start), float(end)) for start, end in regions if end - start >= min_duration_on]
+
+def segment_audio(audio_path:str, audio_id:int, parameters:Dict)->List[Dict]:
+    """
+    Segment one local audio file
+    :param audio_path: local copy of the source audio
+    :param audio_id: audio_collection id of the source
+    :param parameters: min_duration_on, min_duration_off, energy_margin, flux_ratio, energy_hysteresis
+    :return: List of Audio_Segments records as dicts, same fields as the pyannote API
+    """
+
+    rms, flux = frame_features(iter_blocks(audio_path))
+    if len(rms) == 0:
+        return []
+
+    mask : np.ndarray = speech_frames(rms,
+                                      flux,
+                                      energy_margin=parameters.get("energy_margin", 12.0),
+                                      flux_ratio=parameters.get("flux_ratio", 2.0),
+                                      energy_hysteresis=parameters.get("energy_hysteresis", 6.0))
+
+    regions = frames_to_regions(mask,
+                                HOP_LENGTH / VAD_SAMPLE_RATE,
+                                min_duration_on=parameters.get("min_duration_on", 0.25),
+                                min_duration_off=parameters.get("min_duration_off", 0.5))
+
+    return [{"Audio_id": audio_id,
+             "Segment_number": str(number),
+             "Start_time": start,
+             "End_time": end} for number, (start, end) in enumerate(regions)]
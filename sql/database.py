@@ -1,10 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, update
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from urllib.parse import quote_plus
 from contextlib import contextmanager
 from environments.environments import Environments
-from typing import List, Iterable
+from typing import List, Iterable, Iterator, Dict, Set
+from collections import defaultdict
 import pandas as pd
 
 
@@ -63,6 +64,63 @@ class Database:
         with self.session_scope() as session:
             return session.query(model).filter(model.Status.in_(status)).all()
 
+    def iter_from_model(self,
+                        model: object,
+                        columns: List[str] = None,
+                        page_size: int = 1000,
+                        filters: List = None) -> Iterator[object]:
+        """
+        Yield rows of a model in keyset pages (WHERE id > last_id ORDER BY id LIMIT page_size),
+        each page read in its own short session so memory stays constant
+        :param model: ORM model to read
+        :param columns: only select these columns (id is always selected), rows are returned instead of ORM objects
+        :param page_size: number of rows fetched per query
+        :param filters: extra SQLAlchemy filter expressions
+        """
+        entities : List = [model.id] + [getattr(model, c) for c in columns if c != "id"] if columns else [model]
+        last_id : int = None
+
+        while True:
+            with self.session_scope() as session:
+                query = session.query(*entities)
+                for condition in filters or []:
+                    query = query.filter(condition)
+                if last_id is not None:
+                    query = query.filter(model.id > last_id)
+                page = query.order_by(model.id).limit(page_size).all()
+
+            yield from page
+
+            if len(page) < page_size:
+                return
+            last_id = page[-1].id
+
+    def iter_from_model_with_status(self,
+                                    model: object,
+                                    status: List[str],
+                                    columns: List[str] = None,
+                                    page_size: int = 1000) -> Iterator[object]:
+        return self.iter_from_model(model, columns=columns, page_size=page_size, filters=[model.Status.in_(status)])
+
+    def get_existing_values(self, model: object, column: str, values: Iterable, chunk_size: int = 900) -> Set:
+        """
+        Return the subset of values already stored in model.column,
+        checked with WHERE column IN (...) chunks so an indexed column is used
+        """
+        values = list(values)
+        field = getattr(model, column)
+        existing : Set = set()
+
+        with self.session_scope() as session:
+            for start in range(0, len(values), chunk_size):
+                existing.update(row[0] for row in session.query(field).filter(field.in_(values[start:start + chunk_size])))
+
+        return existing
+
+    def get_first_from_model(self, model: object, **filters) -> object:
+        with self.session_scope() as session:
+            return session.query(model).filter_by(**filters).first()
+
     def add_data_to_db(self, model: object, data: List[dict]) -> None:
         with self.session_scope() as session:
             session.bulk_insert_mappings(model, data)
@@ -76,16 +134,33 @@ class Database:
                     session.delete(to_remove)
                     session.commit()
 
-    def update_status(self, model: object, id_list: List[int], status_list: List[str]) -> None:
-        """Update Status in Database"""
+    def update_row(self, model: object, row_id: int, values: Dict) -> None:
+        with self.session_scope() as session:
+            session.execute(update(model).where(model.id == row_id).values(**values))
+            session.commit()
+
+    def update_status(self, model: object, id_list: List[int], status_list: List[str], chunk_size: int = 900) -> None:
+        """
+        Update Status in Database.
+        Ids are grouped by target status and written with one
+        UPDATE ... WHERE id IN (...) per chunk, chunk_size is kept under
+        the bound parameter limit of sqlite (999) and sql server (2100)
+        """
+        status_by_id : Dict[int, str] = {value: sta for value, sta in zip(id_list, status_list) if value is not None}
+
+        ids_by_status : Dict[str, List[int]] = defaultdict(list)
+        for value, sta in status_by_id.items():
+            ids_by_status[sta].append(value)
+
         with self.session_scope() as session:
-            for value, sta in zip(id_list, status_list):
-                try:
-                    entry_to_modify = session.query(model).filter_by(id=value).first()
-                    if entry_to_modify:
-                        entry_to_modify.Status = sta
-                except Exception as e:
-                    print(f"Error updating status for ID {value}: {e}")
+            for sta, ids in ids_by_status.items():
+                for start in range(0, len(ids), chunk_size):
+                    session.execute(
+                        update(model)
+                        .where(model.id.in_(ids[start:start + chunk_size]))
+                        .values(Status=sta)
+                        .execution_options(synchronize_session=False)
+                    )
             session.commit()
 
     def query_to_dataframe(self, query_text: str, params: Iterable = None, chunksize: int = None) -> pd.DataFrame:
@@ -0,0 +1,86 @@
+"""
+Shared fixtures: an in-memory database with the pipeline schema and a stub of
+the whisper api, run the tests from the repository root:
+    python -m pytest tests
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set
+import pytest
+from sql.database import Database
+from models.models import EntityDboBase
+
+
+class MemoryConfig:
+
+    def get_connection_string(self) -> str:
+        return "sqlite://"
+
+
+@pytest.fixture
+def database() -> Database:
+    database = Database(MemoryConfig())
+    EntityDboBase.metadata.create_all(database._db)
+    return database
+
+
+class TranscriptionHandler(BaseHTTPRequestHandler):
+
+    """
+    Answer GET /transcription with one transcription and POST /transcription/batch
+    with one transcription per requested audio, except the audio ids in `omitted`,
+    plus the audio ids in `extra` that were never requested
+    """
+
+    def _payload(self) -> Dict:
+        length : int = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _reply(self, body: object, status: int = 200) -> None:
+        data : bytes = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path != "/transcription":
+            return self._reply({"detail": "Not Found"}, 404)
+
+        payload : Dict = self._payload()
+        self.server.calls.append((self.path, [payload.get("audio_id")]))
+        self._reply({"audio_id": payload.get("audio_id"), "transcription": f"text {payload.get('audio_id')}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/transcription/batch":
+            return self._reply({"detail": "Not Found"}, 404)
+
+        audios : List[Dict] = self._payload().get("audios", [])
+        self.server.calls.append((self.path, [audio.get("audio_id") for audio in audios]))
+        ids : List[int] = [audio.get("audio_id") for audio in audios if audio.get("audio_id") not in self.server.omitted]
+        # answered in reverse order so results cannot be matched by position
+        self._reply([{"audio_id": audio_id, "transcription": f"text {audio_id}"}
+                     for audio_id in reversed(ids + sorted(self.server.extra))])
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def transcription_server():
+    """
+    Stub whisper api on a free local port, `omitted` and `extra` can be set by the test
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TranscriptionHandler)
+    server.calls : List = []
+    server.omitted : Set[int] = set()
+    server.extra : Set[int] = set()
+    server.url : str = f"http://127.0.0.1:{server.server_port}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
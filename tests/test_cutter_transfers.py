@@ -0,0 +1,95 @@
+from typing import Dict, List
+import logging
+import numpy as np
+import soundfile as sf
+import pytest
+from models.models import AudioCollection, Audio_Segments, Cutted_Audios
+from services.audio_cutter_service import Audio_Cutter
+
+SAMPLE_RATE : int = 8000
+
+
+class FlakyConnector:
+
+    """
+    Storage serving generated WAV files, downloads of `missing` and uploads
+    starting with a `rejected` prefix fail
+    """
+
+    def __init__(self, missing: List[str], rejected: List[str]) -> None:
+        self.missing = missing
+        self.rejected = rejected
+        self.uploaded : List[str] = []
+
+    def download_file(self, path: str, local_path: str) -> None:
+        if path in self.missing:
+            raise FileNotFoundError(path)
+        sf.write(local_path, np.random.default_rng(0).uniform(-0.5, 0.5, SAMPLE_RATE * 4), SAMPLE_RATE)
+
+    def upload_file(self, local_path: str, path: str) -> None:
+        self.upload_bytes(None, path)
+
+    def upload_bytes(self, data: bytes, path: str) -> None:
+        if any(path.startswith(folder) for folder in self.rejected):
+            raise ConnectionError(f"upload of {path} rejected")
+        self.uploaded.append(path)
+
+
+def add_audios(database, audios: int, segments: int) -> None:
+    database.add_data_to_db(AudioCollection, [{"Audio_name": f"{number}.wav",
+                                               "Filepath": f"audios/{number}.wav",
+                                               "Status": "Segmented"} for number in range(audios)])
+    database.add_data_to_db(Audio_Segments, [{"Audio_id": audio + 1,
+                                              "Segment_number": str(number),
+                                              "Start_time": float(number),
+                                              "End_time": number + 0.5,
+                                              "Status": "Ready_To_Cutted"} for audio in range(audios) for number in range(segments)])
+
+
+def statuses(database, model) -> Dict[int, str]:
+    return {f.id: f.Status for f in database.iter_from_model(model, columns=["Status"])}
+
+
+@pytest.mark.parametrize("transfers", ["fixed", "adaptive", "async"])
+@pytest.mark.parametrize("to_buffer", [False, True])
+def test_failed_transfers_are_not_committed(database, tmp_path, monkeypatch, transfers, to_buffer):
+    monkeypatch.chdir(tmp_path)
+    add_audios(database, audios=4, segments=3)
+    # audio 2 cannot be downloaded, one segment of audio 3 cannot be uploaded
+    connector = FlakyConnector(missing=["audios/1.wav"], rejected=["cutted_audios/3/1"])
+
+    cutter = Audio_Cutter(database, connector, logging.getLogger("test"))
+    cutter.cut_mode, cutter.cut_workers, cutter.cut_to_buffer = "memory", 1, to_buffer
+    cutter.pipeline, cutter.cache, cutter.output = False, None, None
+    cutter.async_transfers = transfers == "async"
+    cutter.adaptive_transfers = transfers == "adaptive"
+
+    cutter.run_cut_audios()
+
+    assert statuses(database, AudioCollection) == {1: "Audio_Cutted", 2: "Segmented", 3: "Segmented", 4: "Audio_Cutted"}
+    assert sorted({f.Audio_id for f in database.iter_from_model(Cutted_Audios, columns=["Audio_id"])}) == [1, 4]
+    assert [status for status in statuses(database, Audio_Segments).values()].count("Segment_Cutted") == 6
+    assert len(connector.uploaded) == 8
+
+
+def test_failed_cut_does_not_stop_the_chunk(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    add_audios(database, audios=3, segments=2)
+    connector = FlakyConnector(missing=[], rejected=[])
+
+    cutter = Audio_Cutter(database, connector, logging.getLogger("test"))
+    cutter.cut_mode, cutter.cut_workers, cutter.cut_to_buffer = "memory", 1, True
+    cutter.pipeline, cutter.cache, cutter.output = False, None, None
+    cutter.async_transfers = cutter.adaptive_transfers = False
+
+    download = cutter._download_audio
+    def corrupt_second(audio):
+        download(audio)
+        if audio.get("id") == 2:
+            with open(f"audios/2/{audio.get('Audio_name')}", "wb") as file:
+                file.write(b"not audio")
+    cutter._download_audio = corrupt_second
+
+    cutter.run_cut_audios()
+
+    assert statuses(database, AudioCollection) == {1: "Audio_Cutted", 2: "Segmented", 3: "Audio_Cutted"}
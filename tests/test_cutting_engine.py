@@ -0,0 +1,35 @@
+import io
+import numpy as np
+import soundfile as sf
+import pytest
+from services.cutting_engine import output_settings, write_segment
+
+SEGMENT : dict = {"Audio_id": 1, "id": 1, "Segment_number": "0", "Start_time": 0.0, "End_time": 1.0}
+
+
+def test_default_output_is_pcm16_wav():
+    record = write_segment(SEGMENT, np.zeros(22050, dtype="float32"), 22050, to_buffer=True)
+
+    info = sf.info(io.BytesIO(record["Data"]))
+    assert (info.format, info.subtype, info.samplerate) == ("WAV", "PCM_16", 22050)
+
+
+@pytest.mark.parametrize("output_format", ["WAV", "FLAC", "OPUS"])
+def test_output_is_resampled(output_format):
+    output = output_settings(16000, output_format)
+    record = write_segment(SEGMENT, np.zeros(44100, dtype="float32"), 44100, to_buffer=True, output=output)
+
+    info = sf.info(io.BytesIO(record["Data"]))
+    assert record["Filepath"].endswith(output["extension"])
+    assert (info.subtype, info.samplerate) == (output["subtype"], 16000)
+
+
+@pytest.mark.parametrize("samplerate", [8000, 12000, 16000, 24000, 48000])
+def test_opus_sample_rates(samplerate):
+    assert output_settings(samplerate, "OPUS")["samplerate"] == samplerate
+
+
+@pytest.mark.parametrize("samplerate, output_format", [(22050, "OPUS"), (44100, "OPUS"), (16000, "MP3")])
+def test_unsupported_output_is_rejected(samplerate, output_format):
+    with pytest.raises(ValueError):
+        output_settings(samplerate, output_format)
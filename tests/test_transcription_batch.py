@@ -0,0 +1,80 @@
+from typing import Dict, List
+import logging
+import pytest
+from environments.environments import Environments
+from models.models import Audios_Transcriptions, Cutted_Audios
+from services.audio_transcription_service import Audio_Transcrioption
+
+
+class LinkConnector:
+
+    def get_public_link(self, path: str) -> str:
+        return f"http://storage/{path}"
+
+    def get_public_links(self, paths: List[str]) -> Dict[str, str]:
+        return {path: self.get_public_link(path) for path in paths}
+
+
+def add_cutted_audios(database, durations: List[float]) -> List[int]:
+    database.add_data_to_db(Cutted_Audios, [{"Audio_id": 1,
+                                             "Segment_id": number + 1,
+                                             "Filepath": f"cutted/{number}.wav",
+                                             "Start_time": 0.0,
+                                             "End_time": duration,
+                                             "Status": "Ready_To_Transcribe"} for number, duration in enumerate(durations)])
+    return [f.id for f in database.iter_from_model(Cutted_Audios, columns=["id"])]
+
+
+@pytest.fixture
+def transcriber(database, transcription_server, monkeypatch):
+    monkeypatch.setitem(Environments.Api_endpoints, "WHISPER", transcription_server.url)
+    return Audio_Transcrioption(database, LinkConnector(), logging.getLogger("test"))
+
+
+def stored(database) -> Dict[int, str]:
+    return {f.Audio_id: f.Transcription for f in database.iter_from_model(Audios_Transcriptions, columns=["Audio_id", "Transcription"])}
+
+
+def statuses(database) -> Dict[int, str]:
+    return {f.id: f.Status for f in database.iter_from_model(Cutted_Audios, columns=["Status"])}
+
+
+def test_single_requests(database, transcriber, transcription_server):
+    ids = add_cutted_audios(database, [5.0] * 3)
+    transcriber.request_batch_size = 1
+
+    transcriber.run_transcription()
+
+    assert {path for path, _ in transcription_server.calls} == {"/transcription"}
+    assert stored(database) == {audio_id: f"text {audio_id}" for audio_id in ids}
+    assert set(statuses(database).values()) == {"Transcribed"}
+
+
+def test_batch_maps_transcriptions_to_ids(database, transcriber, transcription_server):
+    ids = add_cutted_audios(database, [5.0] * 7)
+    transcriber.request_batch_size = 3
+    transcription_server.omitted = {ids[1], ids[5]}
+    transcription_server.extra = {999}
+
+    transcriber.run_transcription()
+
+    batches = [audio_ids for path, audio_ids in transcription_server.calls]
+    assert {path for path, _ in transcription_server.calls} == {"/transcription/batch"}
+    assert sorted(len(batch) for batch in batches) == [1, 3, 3]
+    assert sorted(audio_id for batch in batches for audio_id in batch) == ids
+
+    # every transcription is stored on its own audio, ids the server did not
+    # answer stay to transcribe and unrequested ids are ignored
+    answered = [audio_id for audio_id in ids if audio_id not in transcription_server.omitted]
+    assert stored(database) == {audio_id: f"text {audio_id}" for audio_id in answered}
+    assert statuses(database) == {audio_id: "Transcribed" if audio_id in answered else "Ready_To_Transcribe" for audio_id in ids}
+
+
+def test_batches_respect_duration(database, transcriber, transcription_server):
+    add_cutted_audios(database, [120.0, 120.0, 120.0, 30.0])
+    transcriber.request_batch_size = 10
+    transcriber.request_batch_duration = 300
+
+    transcriber.run_transcription()
+
+    assert sorted(len(audio_ids) for _, audio_ids in transcription_server.calls) == [2, 2]
@@ -0,0 +1,47 @@
+from typing import Dict
+import pytest
+from botocore.exceptions import ClientError
+from boto3.exceptions import S3UploadFailedError
+from connector.transfer_scheduler import AdaptiveTransferScheduler, is_throttled
+
+
+def client_error(code: str, status: int) -> ClientError:
+    return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "PutObject")
+
+
+def upload_failed(cause: Exception) -> S3UploadFailedError:
+    """
+    Raise like boto3 upload_file does, wrapping the ClientError
+    """
+    try:
+        try:
+            raise cause
+        except ClientError as e:
+            raise S3UploadFailedError(f"Failed to upload: {e}") from e
+    except S3UploadFailedError as wrapped:
+        return wrapped
+
+
+@pytest.mark.parametrize("error, throttled", [
+    (client_error("SlowDown", 503), True),
+    (upload_failed(client_error("SlowDown", 503)), True),
+    (upload_failed(client_error("AccessDenied", 403)), False),
+    (S3UploadFailedError("Failed to upload"), False),
+])
+def test_is_throttled(error, throttled):
+    assert is_throttled(error) is throttled
+
+
+def test_wrapped_throttle_is_retried():
+    attempts : Dict[str, int] = {}
+
+    def transfer(item: str) -> None:
+        attempts[item] = attempts.get(item, 0) + 1
+        if attempts[item] == 1:
+            raise upload_failed(client_error("SlowDown", 503))
+
+    scheduler = AdaptiveTransferScheduler(min_workers=2, max_workers=2, backoff=0.01)
+    results = dict(scheduler.run(transfer, ["a", "b", "c"]))
+
+    assert results == {"a": None, "b": None, "c": None}
+    assert attempts == {"a": 2, "b": 2, "c": 2}
@@ -0,0 +1,57 @@
+from typing import List, Tuple
+import numpy as np
+import soundfile as sf
+import pytest
+from services.vad_engine import VAD_SAMPLE_RATE, hysteresis, segment_audio
+
+REGIONS : List[Tuple[float, float]] = [(3.0, 8.0), (12.0, 18.5), (23.0, 27.0)]
+TOLERANCE : float = 0.1
+
+
+def speech_like(path: str, seconds: int = 30, seed: int = 0) -> None:
+    """
+    Low noise with three voiced regions, harmonic tones with a gliding pitch whose
+    amplitude drops to zero every 200 ms like the gaps between syllables
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * VAD_SAMPLE_RATE) / VAD_SAMPLE_RATE
+    audio = 0.01 * rng.standard_normal(len(t))
+
+    for start, end in REGIONS:
+        inside = (t >= start) & (t < end)
+        local = t[inside] - start
+        phase = 2 * np.pi * np.cumsum(150 + 30 * np.sin(2 * np.pi * 0.7 * local)) / VAD_SAMPLE_RATE
+        voiced = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 12))
+        syllables = np.abs(np.sin(2 * np.pi * 2.5 * local)) ** 1.5
+        audio[inside] += 0.3 * voiced * syllables
+
+    sf.write(path, audio.astype("float32"), VAD_SAMPLE_RATE)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("min_duration", [0.0, 0.25])
+def test_syllable_gaps_do_not_split_regions(tmp_path, seed, min_duration):
+    path = str(tmp_path / "speech.wav")
+    speech_like(path, seed=seed)
+
+    segments = segment_audio(path, 7, {"min_duration_on": min_duration, "min_duration_off": min_duration})
+
+    assert len(segments) == len(REGIONS)
+    for segment, (start, end) in zip(segments, REGIONS):
+        assert segment["Audio_id"] == 7
+        assert abs(segment["Start_time"] - start) < TOLERANCE
+        assert abs(segment["End_time"] - end) < TOLERANCE
+
+
+def test_silence_has_no_segments(tmp_path):
+    path = str(tmp_path / "silence.wav")
+    sf.write(path, 0.01 * np.random.default_rng(0).standard_normal(VAD_SAMPLE_RATE * 10).astype("float32"), VAD_SAMPLE_RATE)
+
+    assert segment_audio(path, 1, {}) == []
+
+
+def test_hysteresis_keeps_weak_runs_touching_strong_frames():
+    strong = np.array([0, 0, 1, 0, 0, 0, 0, 0, 0, 0], dtype=bool)
+    weak = np.array([0, 1, 1, 1, 0, 0, 1, 1, 0, 0], dtype=bool)
+
+    assert hysteresis(strong, weak).tolist() == [False, True, True, True, False, False, False, False, False, False]